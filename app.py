@@ -1,13 +1,26 @@
+import time
+
+# Antes de cualquier otro import, para que el tiempo hasta el login incluya su costo
+INICIO_PASADA = time.perf_counter()
+
 import streamlit as st
+import os
 import pickle
+import threading
 from pathlib import Path
 import streamlit_authenticator as stauth
-import folium
 from streamlit.components.v1 import html
-import plotly.graph_objects as go
-import pandas as pd
-import openpyxl
-import geopandas as gpd
+from streamlit.logger import get_logger
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from catalogo import NOMBRES_VARIABLES, PREFIJOS_INDICADOR, nombre_variable
+from graficos import CacheGraficos
+from territorios import RegistroTerritorios, leer_configuracion
+
+# geopandas, folium, plotly, pandas y openpyxl se importan recién después del
+# login (o en el hilo de precarga), para que el formulario de acceso aparezca
+# sin esperar a las librerías pesadas.
+
+logger = get_logger(__name__)
 
 # --- Configuration for your Streamlit App (Optional, but good practice) ---
 st.set_page_config(
@@ -17,6 +30,74 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# --- Arranque rápido ---
+# Con BRUJULA_PRECARGA=0 se desactiva la precarga en segundo plano.
+PRECARGA_ACTIVADA = os.environ.get("BRUJULA_PRECARGA", "1") != "0"
+
+# --- Mapas ---
+# Por encima de esta cantidad de unidades el coroplético se rasteriza en el servidor.
+UMBRAL_RASTER = int(os.environ.get("BRUJULA_UMBRAL_RASTER", "3000"))
+
+@st.cache_resource(show_spinner=False)
+def metricas_arranque(_inicio):
+    """Tiempos de arranque del proceso, compartidos entre sesiones.
+
+    `_inicio` es el comienzo de la primera pasada del script (no se hashea, así
+    que las pasadas siguientes reciben el diccionario ya creado).
+    """
+    return {"inicio": _inicio, "login": None, "primer_mapa": None}
+
+def registrar_tiempo(evento, desde=None):
+    """Registra una sola vez por proceso el tiempo transcurrido hasta un evento.
+
+    Por defecto se mide desde el inicio de la primera pasada; `desde` permite
+    medir desde otro instante (p. ej. el comienzo de la pasada autenticada).
+    """
+    metricas = metricas_arranque(INICIO_PASADA)
+    if metricas[evento] is None:
+        metricas[evento] = time.perf_counter() - (metricas["inicio"] if desde is None else desde)
+        logger.info("Arranque: tiempo hasta %s = %.2f s", evento, metricas[evento])
+
+metricas_arranque(INICIO_PASADA)
+
+# --- Registro de territorios ---
+@st.cache_resource(show_spinner=False)
+def registro_territorios():
+    """Registro compartido por todas las sesiones (ver territorios.toml)."""
+    territorios, memoria_mb = leer_configuracion()
+    return RegistroTerritorios(territorios, memoria_mb)
+
+# --- Caché de gráficos ---
+@st.cache_resource(show_spinner=False)
+def cache_graficos():
+    """Figuras de radar compartidas por todas las sesiones (ver graficos.py)."""
+    return CacheGraficos()
+
+def _precargar():
+    """Importa las librerías pesadas y calienta las cachés de datos."""
+    inicio = time.perf_counter()
+    try:
+        import geopandas  # noqa: F401
+        import folium  # noqa: F401
+        import plotly.graph_objects  # noqa: F401
+        import openpyxl  # noqa: F401
+        registro = registro_territorios()
+        registro.obtener(registro.por_defecto)
+    except Exception:
+        logger.exception("Falló la precarga de datos")
+        return
+    logger.info("Precarga completada en %.2f s", time.perf_counter() - inicio)
+
+@st.cache_resource(show_spinner=False)
+def iniciar_precarga():
+    """Lanza la precarga una única vez por proceso, en un hilo en segundo plano."""
+    hilo = threading.Thread(target=_precargar, name="brujula-precarga", daemon=True)
+    hilo.start()
+    return hilo
+
+if PRECARGA_ACTIVADA:
+    iniciar_precarga()
+
 # --- Autenticador ---
 names = ["Fernando Murillo","Santiago Federico"]
 usernames = ["fmurillo","sfederico"]
@@ -29,6 +110,7 @@ with file_path.open("rb") as file:
 authenticator = stauth.Authenticate(names, usernames, hashed_passwords,"brujula_plat", "abcdef", cookie_expiry_days=30)
 
 name, authenticator_status, username = authenticator.login("ACCESO A LA PLATAFORMA DE LA BRÚJULA","main")
+registrar_tiempo("login")
 
 if authenticator_status == False:
     st.error("El usuario y/o la contraseña es incorrecta.")
@@ -37,69 +119,50 @@ if authenticator_status == None:
     st.error("Por favor, ingresar el usuario y la contraseña.")
 
 if authenticator_status == True:
+    # El primer mapa se mide desde aquí, sin contar el tiempo que se tardó en tipear la contraseña
+    inicio_autenticado = time.perf_counter()
+    import folium
+    from folium import plugins
+    from folium.utilities import JsCode
+    import numpy as np
+    import pandas as pd
+    import geopandas as gpd
+    import shapely
+    import raster
+    import exportar
+
     # --- Carga de Datos ---
-    @st.cache_data
-    def load_data(path):
-        """Carga los datos de un archivo GeoJSON."""
-        return gpd.read_file(path)
-
-    def load_metricas(path):
-        """Carga los datos de un archivo excel."""
-        return pd.read_excel(path)
-    
-    def load_conclusiones(path):
-        """Carga los datos de un archivo excel."""
-        return pd.read_excel(path)
-
-    gdf_data_consolidado_full = load_data("data/4326-santa-maria-consolidado.geojson")
-    df_data_metricas = load_metricas("data/santa-maria-metricas.xlsx")
-    df_data_conclusiones = load_metricas("data/santa-maria-conclusiones.xlsx")
+    registro = registro_territorios()
+    clave_territorio = st.sidebar.selectbox(
+        "Territorio",
+        list(registro.territorios.keys()),
+        format_func=lambda clave: registro.territorios[clave].nombre,
+        key="territorio_select"
+    )
+    with st.spinner("Cargando datos del territorio..."):
+        datos_territorio = registro.obtener(clave_territorio)
+    territorio = datos_territorio.territorio
+    gdf_data_consolidado_full = datos_territorio.gdf
+    df_data_metricas = datos_territorio.metricas
+    df_data_conclusiones = datos_territorio.conclusiones
 
     # --- Funciones Auxiliares ---
 
-    def plot_radar_chart(df_data, category_col, value_col, radar_range=[0, 4]):
-        """Genera un gráfico de radar de Plotly."""
+    def plot_radar_chart(df_data, category_col, value_col, radar_range=[0, 4], key=None):
+        """Genera un gráfico de radar de Plotly (la figura sale de la caché compartida).
+
+        `key` es obligatoria cuando dos gráficos de la misma pasada pueden tener los
+        mismos datos: Streamlit deriva el id del contenido y los tomaría como duplicados.
+        """
         categorias = df_data[category_col].tolist()
         valores = df_data[value_col].tolist()
 
         if not categorias:
             st.warning("No hay categorías para mostrar en el gráfico de radar.")
             return
-            
-        categorias += [categorias[0]]
-        valores += [valores[0]]
-
-        fig = go.Figure(
-            data=go.Scatterpolar(
-                r=valores,
-                theta=categorias,
-                fill='toself',
-                name=value_col,
-                line=dict(color='#FF4B4B')
-            )
-        )
 
-        fig.update_layout(
-            width=300,
-            height=300,
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            polar=dict(
-                bgcolor='rgba(0,0,0,0)',
-                radialaxis=dict(
-                    visible=True,
-                    range=radar_range,
-                    tickvals=[0, 4, 8, 12, 16, 20] if radar_range[1] == 20 else [0, 1, 2, 3, 4],
-                    tickfont=dict(size=10)
-                ),
-                angularaxis=dict(
-                    tickfont=dict(size=11)
-                )
-            ),
-            showlegend=False,
-            margin=dict(l=20, r=20, t=40, b=20)
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        fig = cache_graficos().radar(categorias, valores, value_col, radar_range)
+        st.plotly_chart(fig, use_container_width=True, key=key)
 
     def color_map(valor):
         """Función para mapear 'derechos' a color (degradado de blanco a azul)."""
@@ -109,20 +172,47 @@ if authenticator_status == True:
         except (ValueError, TypeError):
             return "#ffffff"
 
-    def create_folium_map(gdf, selected_variable, zoom_start, tooltip_fields, tooltip_aliases):
-        """Crea y muestra un mapa de Folium."""
+    def rasterizar_variable(clave, gdf, campos):
+        """Coroplético rasterizado y puntos livianos para los tooltips de una selección.
+
+        `clave` identifica la selección (territorio, escala, localidad, variable). El
+        resultado se guarda en la caché del territorio, acotada en bytes y contada en
+        su tamaño, así que se descarta cuando el registro desaloja el territorio.
+        """
+        def crear():
+            data_url, limites = raster.rasterizar(gdf.geometry, [color_map(v) for v in gdf["VALOR"]])
+            puntos = gdf[list(campos)].copy()
+            # Radio del círculo con la misma superficie que la unidad, para que la zona
+            # que muestra el tooltip crezca con el polígono
+            superficie = gdf.geometry.to_crs(gdf.estimate_utm_crs()).area
+            puntos["_radio"] = (superficie / np.pi) ** 0.5
+            puntos = gpd.GeoDataFrame(puntos, geometry=gdf.geometry.representative_point(), crs=gdf.crs)
+            return data_url, limites, puntos.to_json()
+
+        return datos_territorio.rasters.obtener(clave, crear, medir=lambda r: len(r[0]) + len(r[2]))
+
+    def create_folium_map(gdf, selected_variable, zoom_start, tooltip_fields, tooltip_aliases, clave_raster=None):
+        """Crea y muestra un mapa de Folium.
+
+        Si la selección supera UMBRAL_RASTER unidades y se indica `clave_raster`,
+        la variable se dibuja como imagen rasterizada en el servidor.
+        """
         filtered_gdf = gdf.copy()
-        if not filtered_gdf.empty:
+        usar_raster = clave_raster is not None and len(filtered_gdf) > UMBRAL_RASTER
+        ubicacion = list(territorio.centro)
+        if usar_raster:
+            oeste, sur, este, norte = filtered_gdf.total_bounds
+            ubicacion = [(sur + norte) / 2, (oeste + este) / 2]
+        elif not filtered_gdf.empty:
             try:
                 centro = filtered_gdf.geometry.union_all().centroid
+                ubicacion = [centro.y, centro.x]
             except Exception:
-                centro = (-26.779, -66.027)
-        else:
-            centro = (-26.779, -66.027)
+                pass
 
         selected_tile_name = st.session_state.get('current_tile_selection', 'Fondo Mapa')
 
-        m = folium.Map(location=[centro.y, centro.x], zoom_start=zoom_start, tiles=None)
+        m = folium.Map(location=ubicacion, zoom_start=zoom_start, tiles=None, prefer_canvas=usar_raster)
 
         tile_info = TILE_OPTIONS.get(selected_tile_name)
         if tile_info:
@@ -150,96 +240,77 @@ if authenticator_status == True:
                 elif field == 'VARIABLE':
                     existing_aliases.append("Variable:")
 
-        folium.GeoJson(
-            filtered_gdf.to_json(),
-            name=selected_variable,
-            tooltip=folium.GeoJsonTooltip(
-                fields=existing_fields,
-                aliases=existing_aliases
-            ),
-            style_function=lambda feature: {
-                "fillColor": color_map(feature["properties"]["VALOR"]),
-                "color": "#A40000",
-                "weight": 2,
-                "fillOpacity": 0.5,
-            }
-        ).add_to(m)
+        if usar_raster:
+            data_url, limites, puntos_json = rasterizar_variable(clave_raster, filtered_gdf, tuple(existing_fields))
+            folium.raster_layers.ImageOverlay(
+                image=data_url,
+                bounds=limites,
+                name=selected_variable,
+                interactive=False
+            ).add_to(m)
+            # Un círculo invisible por unidad, centrado en un punto interior y de la misma
+            # superficie, recibe el tooltip; en unidades alargadas no cubre todo el polígono.
+            # El radio se lee en el navegador, así el mapa no lleva un estilo por unidad.
+            folium.GeoJson(
+                puntos_json,
+                name=f"{selected_variable} (consulta)",
+                point_to_layer=JsCode(
+                    "function(feature, latlng) {"
+                    " return L.circle(latlng, {radius: feature.properties._radio, stroke: false, fill: true, fillOpacity: 0});"
+                    " }"
+                ),
+                tooltip=folium.GeoJsonTooltip(
+                    fields=existing_fields,
+                    aliases=existing_aliases
+                )
+            ).add_to(m)
+        else:
+            folium.GeoJson(
+                filtered_gdf.to_json(),
+                name=selected_variable,
+                tooltip=folium.GeoJsonTooltip(
+                    fields=existing_fields,
+                    aliases=existing_aliases
+                ),
+                style_function=lambda feature: {
+                    "fillColor": color_map(feature["properties"]["VALOR"]),
+                    "color": "#A40000",
+                    "weight": 2,
+                    "fillOpacity": 0.5,
+                }
+            ).add_to(m)
 
         folium.LayerControl().add_to(m)
         html(m._repr_html_(), height=600)
+        registrar_tiempo("primer_mapa", desde=inicio_autenticado)
+
+    @st.fragment
+    def export_buttons(df, columnas, nombre_archivo, key, formatos=tuple(exportar.FORMATOS)):
+        """Muestra los botones de descarga; el archivo se genera solo cuando se lo pide."""
+        col_formato, col_boton = st.columns([1, 3], vertical_alignment="bottom")
+        with col_formato:
+            formato = st.selectbox("Formato", formatos, key=f"{key}_formato")
+        with col_boton:
+            if st.button("Preparar archivo", key=f"{key}_preparar"):
+                with st.spinner("Generando archivo..."):
+                    with exportar.exportar(df, columnas, formato) as archivo:
+                        datos = archivo.read()
+                st.download_button(
+                    f"Descargar {formato}",
+                    data=datos,
+                    file_name=f"{nombre_archivo}.{exportar.FORMATOS[formato]['extension']}",
+                    mime=exportar.FORMATOS[formato]["mime"],
+                    key=f"{key}_descargar",
+                    on_click="ignore",
+                    type="primary"
+                )
 
-    def display_data_and_charts(df_data, value_col="VALOR"):
+    def display_data_and_charts(df_data, value_col="VALOR", key=None):
         """Muestra la tabla de datos y el gráfico de radar."""
         
-        variable_display_names = {
-        "d-a1": "Seguridad en la tenencia del suelo", "d-a2": "Sin hacinamiento en la vivienda",
-        "d-a3": "Vivienda construida con materiales permanentes", "d-a4": "Vivienda con baño propio",
-        "d-a5": "Viviendas con estándares mínimos de habitabilidad adecuados",
-        "d-b1":"Provisión de agua potable disponible", "d-b2":"Servicio sanitarios o pozos disponibles sin contaminación",
-        "d-b3":"Disponibilidad de drenajes que eviten inundación", "d-b4":"Conexión de energía (electricidad y gas)",
-        "d-b5":"Conexión servicios de telecomunicaciones, Internet, etc.",
-        "d-c1":"Espacios verdes públicos disponibles y mantenidos", "d-c2":"Escuelas pre-escolares, primarias y secundarias",
-        "d-c3":"Hospitales y centros de salud de atención primaria disponibles", "d-c4":"Servicios seguridad policial, bomberos, templos y DC disponibles",
-        "d-c5":"Servicios de alumbrado, barrido y limpieza disponibles",
-        "d-d1":"Calzadas disponibles permitiendo movimiento vehicular", "d-d2":"Aceras disponibles permitiendo circulación peatonal y ciclística con seguridad vial, iluminadas y limpias",
-        "d-d3":"Servicio transporte público guiado disponible a precios accesibles", "d-d4":"Servicios de colectivos, taxis y motos disponibles",
-        "d-d5":"Posibilidad de acceso de ambulancias, bomberos, policía y defensa civil",
-        "d-e1":"Seguridad alimentaria disponible", "d-e2":"Disponibilidad de trabajo, ingresos, medios de sustento y previsión social",
-        "d-e3":"Capacidad de ahorro y re-inversión en mejoras de la vivienda y el barrio", "d-e4":"Tolerancia y aceptación entre grupos sociales diferentes",
-        "d-e5":"Acciones de prevención y reducción de riesgos de contaminación y desastres vigentes",
-
-        "os-a1": "Seguridad en la tenencia del suelo", "os-a2": "Sin hacinamiento en la vivienda",
-        "os-a3": "Vivienda construida con materiales permanentes", "os-a4": "Vivienda con baño propio",
-        "os-a5": "Viviendas con estándares mínimos de habitabilidad adecuados",
-        "os-b1":"Provisión de agua potable disponible", "os-b2":"Servicio sanitarios o pozos disponibles sin contaminación",
-        "os-b3":"Disponibilidad de drenajes que eviten inundación", "os-b4":"Conexión de energía (electricidad y gas)",
-        "os-b5":"Conexión servicios de telecomunicaciones, Internet, etc.",
-        "os-c1":"Espacios verdes públicos disponibles y mantenidos", "os-c2":"Escuelas pre-escolares, primarias y secundarias",
-        "os-c3":"Hospitales y centros de salud de atención primaria disponibles", "os-c4":"Servicios seguridad policial, bomberos, templos y DC disponibles",
-        "os-c5":"Servicios de alumbrado, barrido y limpieza disponibles",
-        "os-d1":"Calzadas disponibles permitiendo movimiento vehicular", "os-d2":"Aceras disponibles permitiendo circulación peatonal y ciclística con seguridad vial, iluminadas y limpias",
-        "os-d3":"Servicio transporte público guiado disponible a precios accesibles", "os-d4":"Servicios de colectivos, taxis y motos disponibles",
-        "os-d5":"Posibilidad de acceso de ambulancias, bomberos, policía y defensa civil",
-        "os-e1":"Seguridad alimentaria disponible", "os-e2":"Disponibilidad de trabajo, ingresos, medios de sustento y previsión social",
-        "os-e3":"Capacidad de ahorro y re-inversión en mejoras de la vivienda y el barrio", "os-e4":"Tolerancia y aceptación entre grupos sociales diferentes",
-        "os-e5":"Acciones de prevención y reducción de riesgos de contaminación y desastres vigentes",
-
-        "op-a1": "Seguridad en la tenencia del suelo", "op-a2": "Sin hacinamiento en la vivienda",
-        "op-a3": "Vivienda construida con materiales permanentes", "op-a4": "Vivienda con baño propio",
-        "op-a5": "Viviendas con estándares mínimos de habitabilidad adecuados",
-        "op-b1":"Provisión de agua potable disponible", "op-b2":"Servicio sanitarios o pozos disponibles sin contaminación",
-        "op-b3":"Disponibilidad de drenajes que eviten inundación", "op-b4":"Conexión de energía (electricidad y gas)",
-        "op-b5":"Conexión servicios de telecomunicaciones, Internet, etc.",
-        "op-c1":"Espacios verdes públicos disponibles y mantenidos", "op-c2":"Escuelas pre-escolares, primarias y secundarias",
-        "op-c3":"Hospitales y centros de salud de atención primaria disponibles", "op-c4":"Servicios seguridad policial, bomberos, templos y DC disponibles",
-        "op-c5":"Servicios de alumbrado, barrido y limpieza disponibles",
-        "op-d1":"Calzadas disponibles permitiendo movimiento vehicular", "op-d2":"Aceras disponibles permitiendo circulación peatonal y ciclística con seguridad vial, iluminadas y limpias",
-        "op-d3":"Servicio transporte público guiado disponible a precios accesibles", "op-d4":"Servicios de colectivos, taxis y motos disponibles",
-        "op-d5":"Posibilidad de acceso de ambulancias, bomberos, policía y defensa civil",
-        "op-e1":"Seguridad alimentaria disponible", "op-e2":"Disponibilidad de trabajo, ingresos, medios de sustento y previsión social",
-        "op-e3":"Capacidad de ahorro y re-inversión en mejoras de la vivienda y el barrio", "op-e4":"Tolerancia y aceptación entre grupos sociales diferentes",
-        "op-e5":"Acciones de prevención y reducción de riesgos de contaminación y desastres vigentes",
-
-        "n-a1": "Seguridad en la tenencia del suelo", "n-a2": "Sin hacinamiento en la vivienda",
-        "n-a3": "Vivienda construida con materiales permanentes", "n-a4": "Vivienda con baño propio",
-        "n-a5": "Viviendas con estándares mínimos de habitabilidad adecuados",
-        "n-b1":"Provisión de agua potable disponible", "n-b2":"Servicio sanitarios o pozos disponibles sin contaminación",
-        "n-b3":"Disponibilidad de drenajes que eviten inundación", "n-b4":"Conexión de energía (electricidad y gas)",
-        "n-b5":"Conexión servicios de telecomunicaciones, Internet, etc.",
-        "n-c1":"Espacios verdes públicos disponibles y mantenidos", "n-c2":"Escuelas pre-escolares, primarias y secundarias",
-        "n-c3":"Hospitales y centros de salud de atención primaria disponibles", "n-c4":"Servicios seguridad policial, bomberos, templos y DC disponibles",
-        "n-c5":"Servicios de alumbrado, barrido y limpieza disponibles",
-        "n-d1":"Calzadas disponibles permitiendo movimiento vehicular", "n-d2":"Aceras disponibles permitiendo circulación peatonal y ciclística con seguridad vial, iluminadas y limpias",
-        "n-d3":"Servicio transporte público guiado disponible a precios accesibles", "n-d4":"Servicios de colectivos, taxis y motos disponibles",
-        "n-d5":"Posibilidad de acceso de ambulancias, bomberos, policía y defensa civil",
-        "n-e1":"Seguridad alimentaria disponible", "n-e2":"Disponibilidad de trabajo, ingresos, medios de sustento y previsión social",
-        "n-e3":"Capacidad de ahorro y re-inversión en mejoras de la vivienda y el barrio", "n-e4":"Tolerancia y aceptación entre grupos sociales diferentes",
-        "n-e5":"Acciones de prevención y reducción de riesgos de contaminación y desastres vigentes",
-        }
-        
         df_chart_data = df_data.copy()
         if 'VARIABLE' in df_chart_data.columns:
-            df_chart_data['VARIABLE'] = df_chart_data['VARIABLE'].map(variable_display_names)
+            df_chart_data['VARIABLE'] = df_chart_data['VARIABLE'].map(nombre_variable)
         
         df_display_for_table = df_chart_data.copy()
 
@@ -254,7 +325,7 @@ if authenticator_status == True:
         with col2:
             st.markdown("Gráfico de la Brújula")
             if not df_chart_data.empty and "VARIABLE" in df_chart_data.columns and value_col in df_chart_data.columns:
-                plot_radar_chart(df_chart_data, "VARIABLE", value_col)
+                plot_radar_chart(df_chart_data, "VARIABLE", value_col, key=key)
             else:
                 st.warning("No hay datos para generar el gráfico de radar.")
 
@@ -272,9 +343,11 @@ if authenticator_status == True:
     st.markdown(f"Bienvenido **{name}** a la Plataforma de La Brújula.")
     authenticator.logout("Logout","main")
     st.markdown("<br>", unsafe_allow_html=True)
-    st.title("PLATAFORMA DE LA BRÚJULA | DEPARTAMENTO DE SANTA MARÍA")
-    st.markdown("**PROYECTO DE FORMULACIÓN DE UN PLAN DE ORDENAMIENTO TERRITORIAL PARA LOS MUNICIPIOS DE SANTA MARIA Y SAN JOSE DEL DEPARTAMENTO SANTA MARIA, PROVINCIA DE CATAMARCA.**")
-    st.caption("EN CONVENIO CON LA UNIVERSIDAD NACIONAL DE CATAMARCA, FACULTAD DE CIENCIAS ECONÓMICAS - CONSEJO FEDERAL DE INVERSIONES - MINISTERIO DE PLANIFICACIÓN TERRITORIAL DE CATAMARCA.")
+    st.title(territorio.titulo)
+    if territorio.proyecto:
+        st.markdown(f"**{territorio.proyecto}**")
+    if territorio.convenio:
+        st.caption(territorio.convenio)
     st.divider()
     st.markdown("**ETAPA DE APLICACIÓN DE LA BRÚJULA**")
     st.badge("BRÚJULA | Pre-diagnóstico", icon="🧭", color="primary")
@@ -292,11 +365,12 @@ if authenticator_status == True:
     with st.container():
         izq, centro, der = st.columns([0.5, 18 , 0.5])
         with centro:
-            st.image("./assets/img/portada.jpg")
+            if territorio.portada:
+                st.image(territorio.portada)
 
-    tabs = ["VIVIENDA Y SUELO", "INFRAESTRUCTURAS", "EQUIPAMIENTOS", "ACCESIBILIDAD", "DESARROLLO LOCAL", "BRÚJULA CONSOLIDADA"]
+    tabs = ["VIVIENDA Y SUELO", "INFRAESTRUCTURAS", "EQUIPAMIENTOS", "ACCESIBILIDAD", "DESARROLLO LOCAL", "BRÚJULA CONSOLIDADA", "ÁREA PERSONALIZADA"]
     st.divider()
-    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(tabs)
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs(tabs)
 
     dimension_vars = {
         "VIVIENDA Y SUELO": ["a1", "a2", "a3", "a4", "a5"],
@@ -306,78 +380,34 @@ if authenticator_status == True:
         "DESARROLLO LOCAL": ["e1", "e2", "e3", "e4", "e5"],
     }
 
-    indicador_prefix = {
-        "Derechos": "d-",
-        "Obras públicas": "op-",
-        "Organización social": "os-",
-        "Normas": "n-"
-    }
+    indicador_prefix = PREFIJOS_INDICADOR
 
-    variable_map_for_display = {
-        "d-a1": "Seguridad en la tenencia del suelo", "d-a2": "Sin hacinamiento en la vivienda",
-        "d-a3": "Vivienda construida con materiales permanentes", "d-a4": "Vivienda con baño propio",
-        "d-a5": "Viviendas con estándares mínimos de habitabilidad adecuados",
-        "d-b1":"Provisión de agua potable disponible", "d-b2":"Servicio sanitarios o pozos disponibles sin contaminación",
-        "d-b3":"Disponibilidad de drenajes que eviten inundación", "d-b4":"Conexión de energía (electricidad y gas)",
-        "d-b5":"Conexión servicios de telecomunicaciones, Internet, etc.",
-        "d-c1":"Espacios verdes públicos disponibles y mantenidos", "d-c2":"Escuelas pre-escolares, primarias y secundarias",
-        "d-c3":"Hospitales y centros de salud de atención primaria disponibles", "d-c4":"Servicios seguridad policial, bomberos, templos y DC disponibles",
-        "d-c5":"Servicios de alumbrado, barrido y limpieza disponibles",
-        "d-d1":"Calzadas disponibles permitiendo movimiento vehicular", "d-d2":"Aceras disponibles permitiendo circulación peatonal y ciclística con seguridad vial, iluminadas y limpias",
-        "d-d3":"Servicio transporte público guiado disponible a precios accesibles", "d-d4":"Servicios de colectivos, taxis y motos disponibles",
-        "d-d5":"Posibilidad de acceso de ambulancias, bomberos, policía y defensa civil",
-        "d-e1":"Seguridad alimentaria disponible", "d-e2":"Disponibilidad de trabajo, ingresos, medios de sustento y previsión social",
-        "d-e3":"Capacidad de ahorro y re-inversión en mejoras de la vivienda y el barrio", "d-e4":"Tolerancia y aceptación entre grupos sociales diferentes",
-        "d-e5":"Acciones de prevención y reducción de riesgos de contaminación y desastres vigentes",
-
-        "os-a1": "Seguridad en la tenencia del suelo", "os-a2": "Sin hacinamiento en la vivienda",
-        "os-a3": "Vivienda construida con materiales permanentes", "os-a4": "Vivienda con baño propio",
-        "os-a5": "Viviendas con estándares mínimos de habitabilidad adecuados",
-        "os-b1":"Provisión de agua potable disponible", "os-b2":"Servicio sanitarios o pozos disponibles sin contaminación",
-        "os-b3":"Disponibilidad de drenajes que eviten inundación", "os-b4":"Conexión de energía (electricidad y gas)",
-        "os-b5":"Conexión servicios de telecomunicaciones, Internet, etc.",
-        "os-c1":"Espacios verdes públicos disponibles y mantenidos", "os-c2":"Escuelas pre-escolares, primarias y secundarias",
-        "os-c3":"Hospitales y centros de salud de atención primaria disponibles", "os-c4":"Servicios seguridad policial, bomberos, templos y DC disponibles",
-        "os-c5":"Servicios de alumbrado, barrido y limpieza disponibles",
-        "os-d1":"Calzadas disponibles permitiendo movimiento vehicular", "os-d2":"Aceras disponibles permitiendo circulación peatonal y ciclística con seguridad vial, iluminadas y limpias",
-        "os-d3":"Servicio transporte público guiado disponible a precios accesibles", "os-d4":"Servicios de colectivos, taxis y motos disponibles",
-        "os-d5":"Posibilidad de acceso de ambulancias, bomberos, policía y defensa civil",
-        "os-e1":"Seguridad alimentaria disponible", "os-e2":"Disponibilidad de trabajo, ingresos, medios de sustento y previsión social",
-        "os-e3":"Capacidad de ahorro y re-inversión en mejoras de la vivienda y el barrio", "os-e4":"Tolerancia y aceptación entre grupos sociales diferentes",
-        "os-e5":"Acciones de prevención y reducción de riesgos de contaminación y desastres vigentes",
-
-        "op-a1": "Seguridad en la tenencia del suelo", "op-a2": "Sin hacinamiento en la vivienda",
-        "op-a3": "Vivienda construida con materiales permanentes", "op-a4": "Vivienda con baño propio",
-        "op-a5": "Viviendas con estándares mínimos de habitabilidad adecuados",
-        "op-b1":"Provisión de agua potable disponible", "op-b2":"Servicio sanitarios o pozos disponibles sin contaminación",
-        "op-b3":"Disponibilidad de drenajes que eviten inundación", "op-b4":"Conexión de energía (electricidad y gas)",
-        "op-b5":"Conexión servicios de telecomunicaciones, Internet, etc.",
-        "op-c1":"Espacios verdes públicos disponibles y mantenidos", "op-c2":"Escuelas pre-escolares, primarias y secundarias",
-        "op-c3":"Hospitales y centros de salud de atención primaria disponibles", "op-c4":"Servicios seguridad policial, bomberos, templos y DC disponibles",
-        "op-c5":"Servicios de alumbrado, barrido y limpieza disponibles",
-        "op-d1":"Calzadas disponibles permitiendo movimiento vehicular", "op-d2":"Aceras disponibles permitiendo circulación peatonal y ciclística con seguridad vial, iluminadas y limpias",
-        "op-d3":"Servicio transporte público guiado disponible a precios accesibles", "op-d4":"Servicios de colectivos, taxis y motos disponibles",
-        "op-d5":"Posibilidad de acceso de ambulancias, bomberos, policía y defensa civil",
-        "op-e1":"Seguridad alimentaria disponible", "op-e2":"Disponibilidad de trabajo, ingresos, medios de sustento y previsión social",
-        "op-e3":"Capacidad de ahorro y re-inversión en mejoras de la vivienda y el barrio", "op-e4":"Tolerancia y aceptación entre grupos sociales diferentes",
-        "op-e5":"Acciones de prevención y reducción de riesgos de contaminación y desastres vigentes",
-
-        "n-a1": "Seguridad en la tenencia del suelo", "n-a2": "Sin hacinamiento en la vivienda",
-        "n-a3": "Vivienda construida con materiales permanentes", "n-a4": "Vivienda con baño propio",
-        "n-a5": "Viviendas con estándares mínimos de habitabilidad adecuados",
-        "n-b1":"Provisión de agua potable disponible", "n-b2":"Servicio sanitarios o pozos disponibles sin contaminación",
-        "n-b3":"Disponibilidad de drenajes que eviten inundación", "n-b4":"Conexión de energía (electricidad y gas)",
-        "n-b5":"Conexión servicios de telecomunicaciones, Internet, etc.",
-        "n-c1":"Espacios verdes públicos disponibles y mantenidos", "n-c2":"Escuelas pre-escolares, primarias y secundarias",
-        "n-c3":"Hospitales y centros de salud de atención primaria disponibles", "n-c4":"Servicios seguridad policial, bomberos, templos y DC disponibles",
-        "n-c5":"Servicios de alumbrado, barrido y limpieza disponibles",
-        "n-d1":"Calzadas disponibles permitiendo movimiento vehicular", "n-d2":"Aceras disponibles permitiendo circulación peatonal y ciclística con seguridad vial, iluminadas y limpias",
-        "n-d3":"Servicio transporte público guiado disponible a precios accesibles", "n-d4":"Servicios de colectivos, taxis y motos disponibles",
-        "n-d5":"Posibilidad de acceso de ambulancias, bomberos, policía y defensa civil",
-        "n-e1":"Seguridad alimentaria disponible", "n-e2":"Disponibilidad de trabajo, ingresos, medios de sustento y previsión social",
-        "n-e3":"Capacidad de ahorro y re-inversión en mejoras de la vivienda y el barrio", "n-e4":"Tolerancia y aceptación entre grupos sociales diferentes",
-        "n-e5":"Acciones de prevención y reducción de riesgos de contaminación y desastres vigentes",
-    }
+    variable_map_for_display = NOMBRES_VARIABLES
+
+    def seleccionar_unidades(cod_prefijo, localidad="Todas las localidades"):
+        """Unidades de una escala (y localidad), compartidas entre sesiones y fragmentos.
+
+        El resultado es el mismo objeto para todos: copiarlo antes de modificarlo.
+        """
+        return datos_territorio.unidades(cod_prefijo, None if localidad == "Todas las localidades" else localidad)
+
+    # --- Renderizado progresivo ---
+    # En una pasada completa los mapas se dibujan al final, cuando el resto del
+    # contenido de todas las pestañas ya está en pantalla. En el rerun de un
+    # fragmento se dibujan en el momento.
+    mapas_pendientes = []
+
+    def es_rerun_de_fragmento():
+        ctx = get_script_run_ctx()
+        return bool(ctx and ctx.fragment_ids_this_run)
+
+    def diferir_mapa(marcador, render):
+        """Reemplaza el marcador por el mapa, ahora o al final de la pasada."""
+        if es_rerun_de_fragmento():
+            with marcador.container():
+                render()
+        else:
+            mapas_pendientes.append((marcador, render))
 
     def create_tab_content(tab_name, gdf_data_full):
         """Genera el contenido para cada pestaña de la brújula."""
@@ -390,22 +420,15 @@ if authenticator_status == True:
             "DESARROLLO LOCAL": ["e1", "e2", "e3", "e4", "e5"],
         }
         
-        escalas_cod = {
-            "Departamento de Santa María": "DEPTO-",
-            "Municipio de Santa María": "MUN-1",
-            "Municipio de San José": "MUN-2",
-            "Localidades y áreas rurales del Departamento de Santa María": "LOC-",
-            "Manzanas del Departamento de Santa María": "MAN-"
-        }
-        
+        escalas_cod = territorio.escalas
+
         opciones_escala = list(escalas_cod.keys())
         selected_escala = st.selectbox("Seleccionar una escala", opciones_escala, key=f"{tab_name}_escala_select")
 
         # Lógica para el selectbox de localidades en las pestañas
         selected_localidad = "Todas las localidades"
-        if selected_escala == "Localidades y áreas rurales del Departamento de Santa María":
-            opciones_localidad = gdf_data_consolidado_full[gdf_data_consolidado_full['COD'].str.startswith('LOC-')]['LOCALIDAD'].dropna().unique().tolist()
-            opciones_localidad = sorted(opciones_localidad)
+        if selected_escala == territorio.escala_localidades:
+            opciones_localidad = datos_territorio.localidades
             selected_localidad = st.selectbox(
                 "Seleccionar una localidad",
                 opciones_localidad,
@@ -426,7 +449,7 @@ if authenticator_status == True:
         )
         st.markdown("<br>", unsafe_allow_html=True)
 
-        if selected_escala not in ("Localidades y áreas rurales del Departamento de Santa María","Manzanas del Departamento de Santa María"):
+        if selected_escala not in territorio.escalas_detalladas:
             df_data_metricas_fil = df_data_metricas[df_data_metricas["ESCALA"] == selected_escala].copy()
             met_sup = df_data_metricas_fil.iloc[0, 2]
             met_pers = df_data_metricas_fil.iloc[0, 3]
@@ -470,7 +493,7 @@ if authenticator_status == True:
                 st.info("**Viviendas ocupadas.** Son las viviendas donde al momento del censo reside al menos una persona, es decir, en las que hay uno o más hogares viviendo. Se excluyen las viviendas que están cerradas, en alquiler, en construcción o sin ocupar por otras razones.")
                 st.info("**Viviendas ocupadas urbanas.** Son las viviendas ocupadas que se encuentran en áreas urbanas (localidades de 2.000 o más habitantes). Permiten estimar características urbanas de los hogares y personas.")
 
-        elif selected_escala == "Localidades y áreas rurales del Departamento de Santa María":
+        elif selected_escala == territorio.escala_localidades:
             df_data_metricas_loc = df_data_metricas[df_data_metricas["ESCALA"] == selected_localidad].copy()
             met_sup = df_data_metricas_loc.iloc[0, 2]
             met_pers = df_data_metricas_loc.iloc[0, 3]
@@ -521,17 +544,12 @@ if authenticator_status == True:
         st.divider()
         
         cod_prefijo = escalas_cod[selected_escala]
-        filtered_gdf = gdf_data_full[gdf_data_full['COD'].str.startswith(cod_prefijo)].copy()
-
-        # Aplicar filtro de localidad si no es "Todas las localidades"
-        if selected_localidad != "Todas las localidades":
-            filtered_gdf=filtered_gdf[filtered_gdf['LOCALIDAD']== selected_localidad].copy()
+        filtered_gdf = seleccionar_unidades(cod_prefijo, selected_localidad)
         
         if filtered_gdf.empty:
             st.warning("No se encontraron datos para la escala y el indicador seleccionados.")
             return
         
-        #if selected_escala not in ("Manzanas del Departamento de Santa María"):
         st.subheader(f"Resultados generales de La Brújula del {selected_escala}")
         dimension_vars_names = dimension_vars.get(tab_name)
         
@@ -578,12 +596,35 @@ if authenticator_status == True:
             # Ordenar el DataFrame
             totales_df_sorted = totales_df.sort_values('Indicador')
             # Llamar a la función con el DataFrame ya ordenado
-            plot_radar_chart(totales_df_sorted, "Indicador", "Suma", radar_range=[0, 20])
+            plot_radar_chart(totales_df_sorted, "Indicador", "Suma", radar_range=[0, 20], key=f"{tab_name}_radar_general")
+
+        with st.expander("Descargar los datos de esta selección"):
+            nombre_archivo = f"brujula-{territorio.clave}-{tab_name.lower().replace(' ', '-')}"
+            st.markdown("Matriz de La Brújula")
+            export_buttons(df_preview, list(df_preview.columns), f"{nombre_archivo}-matriz", f"{tab_name}_export_matriz", formatos=("CSV", "XLSX"))
+            st.markdown("Unidades seleccionadas con sus puntajes")
+            columnas_unidades = [col for col in ["COD", "DEPARTAMENTO", "MUNICIPIO", "LOCALIDAD", "MANZANERO"] if col in filtered_gdf.columns]
+            columnas_unidades += [f"{prefix}{v}" for prefix in indicador_prefix.values() for v in dimension_vars_names if f"{prefix}{v}" in filtered_gdf.columns]
+            columnas_unidades.append(filtered_gdf.geometry.name)
+            export_buttons(filtered_gdf, columnas_unidades, f"{nombre_archivo}-unidades", f"{tab_name}_export_unidades")
 
         st.divider()
 
         
         st.subheader(f"Resultados particulares de La Brújula por dimensión | {selected_escala}")
+        indicator_sections(tab_name, selected_escala, selected_localidad, cod_prefijo, df_preview['Variable'].tolist())
+
+        # Contenido del footer
+        col1, col2, col3 = st.columns([5, 10, 2])
+        with col1:
+            st.markdown("**Realizado con Streamlit por Santiago Federico |** © 2025")
+        with col3:
+            st.markdown("[Contacto por LinkedIn](https://www.linkedin.com/in/santiago-federico/)")
+
+    @st.fragment
+    def indicator_sections(tab_name, selected_escala, selected_localidad, cod_prefijo, nombres_variables):
+        """Matriz por dimensión, conclusiones y mapa; al cambiar el indicador se recalcula solo esta parte."""
+        filtered_gdf = seleccionar_unidades(cod_prefijo, selected_localidad)
         selected_indicador = st.selectbox(
             "Seleccionar tipo de indicador",
             list(indicador_prefix.keys()),
@@ -610,7 +651,8 @@ if authenticator_status == True:
         with st.container():
             display_data_and_charts(
                 df_for_charts,
-                value_col="VALOR"
+                value_col="VALOR",
+                key=f"{tab_name}_radar_indicador"
             )
         st.link_button(
             "Ver fichas de las variables",
@@ -623,7 +665,7 @@ if authenticator_status == True:
         columnas_a_seleccionar = ['ESCALA'] + columnas_de_categoria
         columnas_existentes = [col for col in columnas_a_seleccionar if col in df_data_conclusiones.columns]
         df_data_conclusiones_sel = df_data_conclusiones[columnas_existentes]     
-        if selected_escala not in ("Localidades y áreas rurales del Departamento de Santa María","Manzanas del Departamento de Santa María"):
+        if selected_escala not in territorio.escalas_detalladas:
             st.markdown("A partir de los resultados obtenidos mediante la aplicación de la metodología, es posible esbozar una serie de conclusiones preliminares que permiten orientar el diagnóstico y la toma de decisiones en relación con la dimensión analizada.")
             st.markdown(f"La evaluación de las cinco variables bajo los ejes de derechos, obras públicas, organización social y normativa, ha permitido identificar tanto fortalezas como áreas críticas dentro del {selected_escala}. Estos primeros hallazgos evidencian desequilibrios en el desarrollo territorial y revelan la necesidad de intervenciones diferenciadas según las características específicas de cada variable y eje.")
             #columnas_de_categoria = dimension_vars.get(tab_name, [])
@@ -636,18 +678,18 @@ if authenticator_status == True:
             var_tres = df_data_conclusiones_fil.iloc[0, 3]
             var_cuatro = df_data_conclusiones_fil.iloc[0, 4]
             var_cinco = df_data_conclusiones_fil.iloc[0, 5]
-            st.markdown(f"**{df_preview['Variable'].iloc[0]}.**")
+            st.markdown(f"**{nombres_variables[0]}.**")
             st.write(var_uno)
-            st.markdown(f"**{df_preview['Variable'].iloc[1]}.**")
+            st.markdown(f"**{nombres_variables[1]}.**")
             st.write(var_dos)
-            st.markdown(f"**{df_preview['Variable'].iloc[2]}.**")
+            st.markdown(f"**{nombres_variables[2]}.**")
             st.write(var_tres)
-            st.markdown(f"**{df_preview['Variable'].iloc[3]}.**")
+            st.markdown(f"**{nombres_variables[3]}.**")
             st.write(var_cuatro)
-            st.markdown(f"**{df_preview['Variable'].iloc[4]}.**")
+            st.markdown(f"**{nombres_variables[4]}.**")
             st.write(var_cinco)
 
-        elif selected_escala == "Localidades y áreas rurales del Departamento de Santa María":
+        elif selected_escala == territorio.escala_localidades:
             st.markdown("A partir de los resultados obtenidos mediante la aplicación de la metodología, es posible esbozar una serie de conclusiones preliminares que permiten orientar el diagnóstico y la toma de decisiones en relación con la dimensión analizada.")
             st.markdown(f"La evaluación de las cinco variables bajo los ejes de derechos, obras públicas, organización social y normativa, ha permitido identificar tanto fortalezas como áreas críticas en las {selected_escala}. En **{selected_localidad}** particularmente, el promedio de los subsectores que lo componen evidencian desequilibrios en el desarrollo territorial y revelan la necesidad de intervenciones diferenciadas según las características específicas de cada variable y eje.")
             df_data_conclusiones_loc = df_data_conclusiones_sel[df_data_conclusiones_sel["ESCALA"] == selected_localidad].copy()
@@ -656,15 +698,15 @@ if authenticator_status == True:
             var_tres = df_data_conclusiones_loc.iloc[0, 3]
             var_cuatro = df_data_conclusiones_loc.iloc[0, 4]
             var_cinco = df_data_conclusiones_loc.iloc[0, 5]
-            st.markdown(f"**{df_preview['Variable'].iloc[0]}.**")
+            st.markdown(f"**{nombres_variables[0]}.**")
             st.write(var_uno)
-            st.markdown(f"**{df_preview['Variable'].iloc[1]}.**")
+            st.markdown(f"**{nombres_variables[1]}.**")
             st.write(var_dos)
-            st.markdown(f"**{df_preview['Variable'].iloc[2]}.**")
+            st.markdown(f"**{nombres_variables[2]}.**")
             st.write(var_tres)
-            st.markdown(f"**{df_preview['Variable'].iloc[3]}.**")
+            st.markdown(f"**{nombres_variables[3]}.**")
             st.write(var_cuatro)
-            st.markdown(f"**{df_preview['Variable'].iloc[4]}.**")
+            st.markdown(f"**{nombres_variables[4]}.**")
             st.write(var_cinco)
 
         st.link_button(
@@ -673,8 +715,19 @@ if authenticator_status == True:
         )
         st.divider()
 
+        # El mapa se dibuja al final de la pasada, detrás de un marcador
         st.subheader("Territorialización de los indicadores de la Brújula")
-        
+        marcador = st.empty()
+        marcador.info("Cargando el mapa...")
+        diferir_mapa(
+            marcador,
+            lambda: map_section(tab_name, selected_indicador, existing_selected_variables, cod_prefijo, selected_localidad)
+        )
+
+    @st.fragment
+    def map_section(tab_name, selected_indicador, existing_selected_variables, cod_prefijo, selected_localidad):
+        """Selección de variable y mapa base; sus cambios solo redibujan el mapa."""
+        filtered_gdf = seleccionar_unidades(cod_prefijo, selected_localidad)
         vars_to_display = {key: variable_map_for_display[key] for key in existing_selected_variables}
         
         selected_display_name = st.selectbox(
@@ -708,15 +761,125 @@ if authenticator_status == True:
             selected_display_name,
             9,
             tooltip_fields,
-            tooltip_aliases
+            tooltip_aliases,
+            clave_raster=(territorio.clave, cod_prefijo, selected_localidad, selected_variable_column)
         )
 
-        # Contenido del footer
-        col1, col2, col3 = st.columns([5, 10, 2])
+    @st.fragment
+    def consolidated_indicator_section(cod_prefijo_con):
+        """Brújula consolidada por tipo de indicador; cambiar el indicador solo rerenderiza esta parte."""
+        filtered_gdf_con = seleccionar_unidades(cod_prefijo_con)
+        selected_indicador_con = st.selectbox(
+            "Seleccionar tipo de indicador (consolidado)",
+            list(indicador_prefix.keys()),
+            key="con_indicador_select"
+        )
+
+        prefix_con = indicador_prefix[selected_indicador_con]
+
+        df_consolidado_brújula = pd.DataFrame({
+            'Dimensión': ['VIVIENDA Y SUELO', 'INFRAESTRUCTURAS', 'EQUIPAMIENTOS', 'ACCESIBILIDAD', 'DESARROLLO LOCAL'],
+            'VALOR': [
+                filtered_gdf_con[[f"{prefix_con}{var}" for var in dimension_vars['VIVIENDA Y SUELO']]].mean().mean(),
+                filtered_gdf_con[[f"{prefix_con}{var}" for var in dimension_vars['INFRAESTRUCTURAS']]].mean().mean(),
+                filtered_gdf_con[[f"{prefix_con}{var}" for var in dimension_vars['EQUIPAMIENTOS']]].mean().mean(),
+                filtered_gdf_con[[f"{prefix_con}{var}" for var in dimension_vars['ACCESIBILIDAD']]].mean().mean(),
+                filtered_gdf_con[[f"{prefix_con}{var}" for var in dimension_vars['DESARROLLO LOCAL']]].mean().mean(),
+            ]
+        })
+
+        df_consolidado_brújula.rename(columns={'Dimensión': 'VARIABLE'}, inplace=True)
+
+        display_data_and_charts(
+            df_consolidado_brújula,
+            value_col="VALOR",
+            key="con_radar_indicador"
+        )
+
+    def create_area_content():
+        """Genera la Brújula de un área dibujada o subida por el usuario."""
+        st.subheader("BRÚJULA DE UN ÁREA PERSONALIZADA")
+        st.markdown("Dibujar el área en el mapa y exportarla con el botón **Export**, o subir directamente un polígono en formato GeoJSON. Los resultados se calculan como el promedio de las manzanas que intersectan el área, ponderado por la superficie intersectada.")
+
+        m = folium.Map(location=list(territorio.centro), zoom_start=9, tiles="OpenStreetMap")
+        plugins.Draw(
+            export=True,
+            filename="area.geojson",
+            draw_options={
+                "polyline": False, "circle": False, "marker": False, "circlemarker": False,
+                "polygon": {"allowIntersection": False},
+            }
+        ).add_to(m)
+        html(m._repr_html_(), height=450)
+        area_results()
+
+    @st.fragment
+    def area_results():
+        """Carga del polígono y resultados del área; subir otro archivo solo rerenderiza esta parte."""
+        archivo = st.file_uploader("Subir polígono (GeoJSON)", type=["geojson", "json"], key="area_archivo")
+        if archivo is None:
+            st.info("Todavía no se cargó ningún polígono.")
+            return
+
+        try:
+            gdf_area = gpd.read_file(archivo)
+        except Exception:
+            st.error("No se pudo leer el archivo. Verificar que sea un GeoJSON válido.")
+            return
+        if gdf_area.crs is None:
+            gdf_area = gdf_area.set_crs(4326)
+        gdf_area = gdf_area[gdf_area.geom_type.isin(["Polygon", "MultiPolygon"])]
+        if gdf_area.empty:
+            st.error("El archivo no contiene polígonos.")
+            return
+
+        columnas = [f"{prefix}{v}" for prefix in indicador_prefix.values() for vars_dim in dimension_vars.values() for v in vars_dim]
+        columnas = [col for col in columnas if col in gdf_data_consolidado_full.columns]
+        try:
+            # Los polígonos que se cruzan a sí mismos (p. ej. en forma de moño) se reparan antes de unirlos
+            poligono = shapely.union_all(shapely.make_valid(gdf_area.to_crs(4326).geometry.values))
+            with st.spinner("Calculando la Brújula del área..."):
+                resultado = datos_territorio.indice_areas(columnas).agregar(poligono)
+        except shapely.errors.GEOSException:
+            st.error("No se pudo procesar la geometría del polígono. Verificar que sea un polígono válido.")
+            return
+
+        if resultado["manzanas"] == 0:
+            st.warning("El área no intersecta ninguna manzana del territorio.")
+            return
+
+        col1, col2 = st.columns(2)
         with col1:
-            st.markdown("**Realizado con Streamlit por Santiago Federico |** © 2025")
-        with col3:
-            st.markdown("[Contacto por LinkedIn](https://www.linkedin.com/in/santiago-federico/)")
+            st.metric(label="Manzanas intersectadas", value=resultado["manzanas"])
+        with col2:
+            st.metric(label="Superficie de manzanas en el área (km²)", value=round(resultado["superficie_km2"], 3))
+
+        medias = resultado["medias"]
+        data_area = {"Dimensión": list(dimension_vars.keys())}
+        for indicador, prefix in indicador_prefix.items():
+            data_area[indicador] = [
+                pd.Series([medias.get(f"{prefix}{v}") for v in vars_dim], dtype=float).mean()
+                for vars_dim in dimension_vars.values()
+            ]
+        df_area_preview = pd.DataFrame(data_area).round(2)
+
+        totales_area = df_area_preview.drop('Dimensión', axis=1).sum().to_dict()
+        totales_area_df = pd.DataFrame({
+            "Indicador": list(totales_area.keys()),
+            "Suma": list(totales_area.values())
+        })
+        totales_area['Dimensión'] = 'SUMA'
+        df_area_preview = pd.concat([df_area_preview, pd.DataFrame([totales_area])], ignore_index=True)
+
+        col_table_area, col_chart_area = st.columns(2)
+        with col_table_area:
+            st.markdown("Matriz de La Brújula del área")
+            st.dataframe(df_area_preview, hide_index=True)
+        with col_chart_area:
+            st.markdown("Gráfico de La Brújula del área")
+            orden_deseado_general = ["Normas","Derechos","Obras públicas","Organización social"]
+            totales_area_df['Indicador'] = pd.Categorical(totales_area_df['Indicador'], categories=orden_deseado_general, ordered=True)
+            plot_radar_chart(totales_area_df.sort_values('Indicador'), "Indicador", "Suma", radar_range=[0, 20], key="area_radar")
 
     with tab1:
         create_tab_content("VIVIENDA Y SUELO", gdf_data_consolidado_full)
@@ -738,19 +901,13 @@ if authenticator_status == True:
         st.markdown("Esta pestaña aún esta en construcción.")
         
         st.subheader("Filtros de Nivel Jerárquico")
-        escalas_cod_con = {
-            "Departamento de Santa María": "DPTO-",
-            "Municipio de Santa María": "MUN-1",
-            "Municipio de San José": "MUN-2",
-            "Localidades y áreas rurales del Departamento de Santa María": "LOC-",
-            "Manzanas del Departamento de Santa María": "MAN-"
-        }
-        
+        escalas_cod_con = territorio.escalas
+
         opciones_escala_con = list(escalas_cod_con.keys())
         selected_escala_con = st.selectbox("Seleccionar una escala", opciones_escala_con, key=f"con_escala_select")
         
         cod_prefijo_con = escalas_cod_con[selected_escala_con]
-        filtered_gdf_con = gdf_data_consolidado_full[gdf_data_consolidado_full['COD'].str.startswith(cod_prefijo_con)].copy()
+        filtered_gdf_con = seleccionar_unidades(cod_prefijo_con)
 
         if not filtered_gdf_con.empty:
             st.subheader("Tabla Resumen por Dimensión y Tipo de Indicador")
@@ -780,35 +937,11 @@ if authenticator_status == True:
                 st.dataframe(df_consolidado_preview, hide_index=True)
             with col_chart_con:
                 st.markdown("Suma por tipo de indicador")
-                plot_radar_chart(totales_consolidado_df, "Indicador", "Suma", radar_range=[0, 20])
+                plot_radar_chart(totales_consolidado_df, "Indicador", "Suma", radar_range=[0, 20], key="con_radar_general")
 
             st.divider()
             
-            selected_indicador_con = st.selectbox(
-                "Seleccionar tipo de indicador (consolidado)",
-                list(indicador_prefix.keys()),
-                key="con_indicador_select"
-            )
-            
-            prefix_con = indicador_prefix[selected_indicador_con]
-            
-            df_consolidado_brújula = pd.DataFrame({
-                'Dimensión': ['VIVIENDA Y SUELO', 'INFRAESTRUCTURAS', 'EQUIPAMIENTOS', 'ACCESIBILIDAD', 'DESARROLLO LOCAL'],
-                'VALOR': [
-                    filtered_gdf_con[[f"{prefix_con}{var}" for var in dimension_vars['VIVIENDA Y SUELO']]].mean().mean(),
-                    filtered_gdf_con[[f"{prefix_con}{var}" for var in dimension_vars['INFRAESTRUCTURAS']]].mean().mean(),
-                    filtered_gdf_con[[f"{prefix_con}{var}" for var in dimension_vars['EQUIPAMIENTOS']]].mean().mean(),
-                    filtered_gdf_con[[f"{prefix_con}{var}" for var in dimension_vars['ACCESIBILIDAD']]].mean().mean(),
-                    filtered_gdf_con[[f"{prefix_con}{var}" for var in dimension_vars['DESARROLLO LOCAL']]].mean().mean(),
-                ]
-            })
-            
-            df_consolidado_brújula.rename(columns={'Dimensión': 'VARIABLE'}, inplace=True)
-            
-            display_data_and_charts(
-                df_consolidado_brújula,
-                value_col="VALOR"
-            )
+            consolidated_indicator_section(cod_prefijo_con)
         else:
             st.warning("No se encontraron datos consolidados para la selección de escala.")
         
@@ -817,4 +950,19 @@ if authenticator_status == True:
         with col1:
             st.markdown("**Realizado con Streamlit por Santiago Federico |** © 2025")
         with col3:
-            st.markdown("[Contacto por LinkedIn](https://www.linkedin.com/in/santiago-federico/)")
\ No newline at end of file
+            st.markdown("[Contacto por LinkedIn](https://www.linkedin.com/in/santiago-federico/)")
+
+    with tab7:
+        create_area_content()
+
+        # Contenido del footer
+        col1, col2, col3 = st.columns([5, 10, 2])
+        with col1:
+            st.markdown("**Realizado con Streamlit por Santiago Federico |** © 2025")
+        with col3:
+            st.markdown("[Contacto por LinkedIn](https://www.linkedin.com/in/santiago-federico/)")
+
+    # Mapas diferidos: se dibujan cuando el contenido de todas las pestañas ya está en pantalla
+    for marcador, render in mapas_pendientes:
+        with marcador.container():
+            render()
\ No newline at end of file
@@ -0,0 +1,148 @@
+"""Agregación de La Brújula sobre áreas arbitrarias (polígonos dibujados o subidos).
+
+Los puntajes de un área son la media de las manzanas que la intersectan,
+ponderada por la superficie intersectada. Para que las consultas repetidas o
+cercanas sean rápidas, el territorio se divide en una grilla fija y se guardan
+en caché, por celda, los recortes de las manzanas y sus sumas ponderadas: las
+celdas que el polígono cubre por completo se suman sin operaciones geométricas
+y solo las celdas del borde se vuelven a intersectar. Solo se visitan las celdas
+con manzanas, y la caché se descarta en orden LRU por encima de un tope en bytes
+que se cuenta, completo, en el tamaño del territorio.
+"""
+import math
+import threading
+from collections import OrderedDict
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from territorios import MB, tamano_geometrias
+
+TAMANO_CELDA_M = 500
+MAX_CACHE_CELDAS_MB = 32
+
+
+class IndiceAreas:
+    """Índice espacial de las manzanas de un territorio, en metros (UTM)."""
+
+    def __init__(self, gdf_manzanas, columnas, tamano_celda=TAMANO_CELDA_M, max_cache_mb=MAX_CACHE_CELDAS_MB):
+        self.crs = gdf_manzanas.estimate_utm_crs()
+        proyectadas = gdf_manzanas.to_crs(self.crs)
+        self.columnas = list(columnas)
+        self.geometrias = shapely.make_valid(np.asarray(proyectadas.geometry.values))
+        self.valores = proyectadas[self.columnas].to_numpy(dtype=float)
+        self.arbol = shapely.STRtree(self.geometrias)
+        self.tamano_celda = tamano_celda
+        self.ocupadas = self._celdas_ocupadas()
+        self.max_cache_bytes = int(max_cache_mb * MB)
+        self._celdas = OrderedDict()
+        self._bytes_celdas = 0
+        self._lock = threading.Lock()
+
+    @property
+    def tamano_bytes(self):
+        """Índice más el tope de la caché de celdas, que es lo máximo que puede llegar a ocupar."""
+        base = tamano_geometrias(self.geometrias) + self.valores.nbytes + self.ocupadas.nbytes
+        return int(base + self.max_cache_bytes)
+
+    def _celdas_ocupadas(self):
+        """Celdas (i, j) que tocan el rectángulo envolvente de alguna manzana."""
+        t = self.tamano_celda
+        limites = np.floor(shapely.bounds(self.geometrias) / t).astype(int)
+        celdas = set()
+        for i0, j0, i1, j1 in limites:
+            for i in range(i0, i1 + 1):
+                for j in range(j0, j1 + 1):
+                    celdas.add((i, j))
+        return np.array(sorted(celdas), dtype=int).reshape(-1, 2)
+
+    def _caja(self, i, j):
+        t = self.tamano_celda
+        return shapely.box(i * t, j * t, (i + 1) * t, (j + 1) * t)
+
+    def _sumas(self, indices, areas):
+        """Sumas de valor × área y de área con dato, por columna."""
+        valores = self.valores[indices]
+        validos = ~np.isnan(valores)
+        ponderados = np.where(validos, valores, 0) * areas[:, None]
+        return ponderados.sum(axis=0), (validos * areas[:, None]).sum(axis=0)
+
+    def _celda(self, i, j):
+        """Recortes de manzanas dentro de la celda (i, j) y sus sumas, en caché LRU.
+
+        Devuelve None si ninguna manzana entra en la celda; esas no se guardan.
+        """
+        with self._lock:
+            guardada = self._celdas.get((i, j))
+            if guardada is not None:
+                self._celdas.move_to_end((i, j))
+                return guardada[0]
+        caja = self._caja(i, j)
+        indices = self.arbol.query(caja, predicate="intersects")
+        if len(indices) == 0:
+            return None
+        recortes = shapely.intersection(self.geometrias[indices], caja)
+        areas = shapely.area(recortes)
+        celda = (indices, recortes, areas, *self._sumas(indices, areas))
+        tamano = tamano_geometrias(recortes) + indices.nbytes + areas.nbytes
+        with self._lock:
+            if (i, j) not in self._celdas:
+                self._celdas[(i, j)] = (celda, tamano)
+                self._bytes_celdas += tamano
+                while self._bytes_celdas > self.max_cache_bytes and len(self._celdas) > 1:
+                    _, (_, tamano_viejo) = self._celdas.popitem(last=False)
+                    self._bytes_celdas -= tamano_viejo
+        return celda
+
+    def agregar(self, poligono, crs="EPSG:4326"):
+        """Medias ponderadas por superficie de cada columna dentro del polígono.
+
+        Devuelve un diccionario con las medias por columna, la cantidad de
+        manzanas intersectadas y la superficie de manzanas cubierta (km²).
+        """
+        poligono = shapely.make_valid(gpd.GeoSeries([poligono], crs=crs).to_crs(self.crs).iloc[0])
+        shapely.prepare(poligono)
+        sumas = np.zeros(len(self.columnas))
+        pesos = np.zeros(len(self.columnas))
+        manzanas = set()
+        superficie = 0.0
+
+        # Solo se recorren las celdas con manzanas dentro del rectángulo del polígono
+        t = self.tamano_celda
+        minx, miny, maxx, maxy = poligono.bounds
+        i, j = self.ocupadas[:, 0], self.ocupadas[:, 1]
+        en_rango = (
+            (i >= math.floor(minx / t)) & (i <= math.floor(maxx / t))
+            & (j >= math.floor(miny / t)) & (j <= math.floor(maxy / t))
+        )
+        candidatas = self.ocupadas[en_rango]
+        cajas = shapely.box(candidatas[:, 0] * t, candidatas[:, 1] * t, (candidatas[:, 0] + 1) * t, (candidatas[:, 1] + 1) * t)
+        tocadas = shapely.intersects(poligono, cajas)
+        cubiertas = shapely.contains(poligono, cajas)
+
+        for (i, j), cubierta in zip(candidatas[tocadas], cubiertas[tocadas]):
+            celda = self._celda(i, j)
+            if celda is None:
+                continue
+            indices, recortes, areas_celda, sumas_celda, pesos_celda = celda
+            if cubierta:
+                areas = areas_celda
+                sumas += sumas_celda
+                pesos += pesos_celda
+            else:
+                areas = shapely.area(shapely.intersection(recortes, poligono))
+                dentro = areas > 0
+                indices, areas = indices[dentro], areas[dentro]
+                sumas_parciales, pesos_parciales = self._sumas(indices, areas)
+                sumas += sumas_parciales
+                pesos += pesos_parciales
+            manzanas.update(indices.tolist())
+            superficie += areas.sum()
+
+        medias = np.divide(sumas, pesos, out=np.full_like(sumas, np.nan), where=pesos > 0)
+        return {
+            "medias": dict(zip(self.columnas, medias)),
+            "manzanas": len(manzanas),
+            "superficie_km2": superficie / 1e6,
+        }
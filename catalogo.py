@@ -0,0 +1,52 @@
+"""Catálogo de variables de La Brújula.
+
+Las 25 variables (a1 a e5) son las mismas para los cuatro tipos de indicador;
+el código de cada columna es el prefijo del indicador más la variable (p. ej.
+"op-c2"). El catálogo se arma una sola vez, al importar el módulo.
+"""
+
+PREFIJOS_INDICADOR = {
+    "Derechos": "d-",
+    "Obras públicas": "op-",
+    "Organización social": "os-",
+    "Normas": "n-",
+}
+
+VARIABLES = {
+    "a1": "Seguridad en la tenencia del suelo",
+    "a2": "Sin hacinamiento en la vivienda",
+    "a3": "Vivienda construida con materiales permanentes",
+    "a4": "Vivienda con baño propio",
+    "a5": "Viviendas con estándares mínimos de habitabilidad adecuados",
+    "b1": "Provisión de agua potable disponible",
+    "b2": "Servicio sanitarios o pozos disponibles sin contaminación",
+    "b3": "Disponibilidad de drenajes que eviten inundación",
+    "b4": "Conexión de energía (electricidad y gas)",
+    "b5": "Conexión servicios de telecomunicaciones, Internet, etc.",
+    "c1": "Espacios verdes públicos disponibles y mantenidos",
+    "c2": "Escuelas pre-escolares, primarias y secundarias",
+    "c3": "Hospitales y centros de salud de atención primaria disponibles",
+    "c4": "Servicios seguridad policial, bomberos, templos y DC disponibles",
+    "c5": "Servicios de alumbrado, barrido y limpieza disponibles",
+    "d1": "Calzadas disponibles permitiendo movimiento vehicular",
+    "d2": "Aceras disponibles permitiendo circulación peatonal y ciclística con seguridad vial, iluminadas y limpias",
+    "d3": "Servicio transporte público guiado disponible a precios accesibles",
+    "d4": "Servicios de colectivos, taxis y motos disponibles",
+    "d5": "Posibilidad de acceso de ambulancias, bomberos, policía y defensa civil",
+    "e1": "Seguridad alimentaria disponible",
+    "e2": "Disponibilidad de trabajo, ingresos, medios de sustento y previsión social",
+    "e3": "Capacidad de ahorro y re-inversión en mejoras de la vivienda y el barrio",
+    "e4": "Tolerancia y aceptación entre grupos sociales diferentes",
+    "e5": "Acciones de prevención y reducción de riesgos de contaminación y desastres vigentes",
+}
+
+NOMBRES_VARIABLES = {
+    f"{prefijo}{variable}": nombre
+    for prefijo in PREFIJOS_INDICADOR.values()
+    for variable, nombre in VARIABLES.items()
+}
+
+
+def nombre_variable(codigo):
+    """Nombre legible de una columna; los códigos que no son variables se dejan igual."""
+    return NOMBRES_VARIABLES.get(codigo, codigo)
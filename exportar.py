@@ -0,0 +1,162 @@
+"""Exportación de la selección actual a CSV, GeoParquet y XLSX.
+
+CSV y GeoParquet son generadores que recorren el DataFrame por porciones
+(vistas con iloc) y van entregando bytes, de modo que nunca se arma una copia
+completa del DataFrame: los bytes se vuelcan a un archivo temporal que pasa a
+disco cuando supera MAX_EN_MEMORIA. XLSX es un ZIP que openpyxl arma recién al
+guardar, así que el libro se escribe directamente en ese mismo archivo temporal.
+La única copia completa es la del archivo final, que st.download_button
+necesita en memoria.
+"""
+import io
+import json
+import tempfile
+
+import numpy as np
+
+TAMANO_TROZO = 5000
+MAX_EN_MEMORIA = 8 * 1024 * 1024
+
+FORMATOS = {
+    "CSV": {"extension": "csv", "mime": "text/csv"},
+    "GeoParquet": {"extension": "parquet", "mime": "application/vnd.apache.parquet"},
+    "XLSX": {"extension": "xlsx", "mime": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"},
+}
+
+
+def trozos(df, tamano=TAMANO_TROZO):
+    """Recorre el DataFrame por porciones consecutivas de filas."""
+    for inicio in range(0, len(df), tamano):
+        yield df.iloc[inicio:inicio + tamano]
+
+
+def _nombre_geometria(df):
+    nombre = getattr(df, "_geometry_column_name", None)
+    return nombre if nombre in df.columns else None
+
+
+class _Sumidero(io.RawIOBase):
+    """Destino de escritura que lleva la posición total escrita.
+
+    Acumula los bytes hasta que se los pide con vaciar(), o, si se indica
+    `destino`, los reenvía a ese archivo sin guardarlos.
+    """
+
+    def __init__(self, destino=None):
+        self._destino = destino
+        self._partes = []
+        self._posicion = 0
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        datos = bytes(datos)
+        if self._destino is not None:
+            self._destino.write(datos)
+        else:
+            self._partes.append(datos)
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def vaciar(self):
+        datos = b"".join(self._partes)
+        self._partes = []
+        return datos
+
+
+def generar_csv(df, columnas):
+    """CSV en UTF-8 con BOM (para Excel); la geometría, si la hay, va como WKT."""
+    import shapely
+
+    geometria = _nombre_geometria(df)
+    atributos = [col for col in columnas if col != geometria]
+    yield "\ufeff".encode("utf-8")
+    for numero, trozo in enumerate(trozos(df)):
+        salida = trozo[atributos]
+        if geometria in columnas:
+            salida = salida.assign(**{geometria: shapely.to_wkt(trozo[geometria].values, rounding_precision=7)})
+        yield salida.to_csv(index=False, header=numero == 0).encode("utf-8")
+
+
+def generar_geoparquet(gdf, columnas):
+    """GeoParquet 1.0 (geometría en WKB), un row group por porción."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import shapely
+
+    geometria = _nombre_geometria(gdf)
+    atributos = [col for col in columnas if col != geometria]
+    campos = []
+    for col in atributos:
+        dtype = gdf[col].dtype
+        campos.append(pa.field(col, pa.string() if dtype == object else pa.from_numpy_dtype(dtype)))
+    metadatos = {}
+    if geometria:
+        campos.append(pa.field(geometria, pa.binary()))
+        tipos = sorted(set(gdf.geom_type.dropna()))
+        metadatos[b"geo"] = json.dumps({
+            "version": "1.0.0",
+            "primary_column": geometria,
+            "columns": {geometria: {
+                "encoding": "WKB",
+                "geometry_types": tipos,
+                "crs": gdf.crs.to_json_dict() if gdf.crs is not None else None,
+                "bbox": [float(v) for v in gdf.total_bounds],
+            }},
+        }).encode("utf-8")
+    esquema = pa.schema(campos, metadata=metadatos)
+
+    sumidero = _Sumidero()
+    with pq.ParquetWriter(sumidero, esquema) as escritor:
+        for trozo in trozos(gdf):
+            arreglos = [pa.array(trozo[col].to_numpy(), type=esquema.field(col).type, from_pandas=True) for col in atributos]
+            if geometria:
+                arreglos.append(pa.array(shapely.to_wkb(np.asarray(trozo[geometria].values)), type=pa.binary()))
+            escritor.write_table(pa.Table.from_arrays(arreglos, schema=esquema))
+            yield sumidero.vaciar()
+    yield sumidero.vaciar()
+
+
+def escribir_xlsx(df, columnas, destino, hoja="Datos"):
+    """XLSX con openpyxl en modo write-only, escrito en `destino`; la geometría no se incluye.
+
+    En modo write-only openpyxl vuelca las filas a un temporal en disco y al
+    guardar las comprime directamente en `destino`, sin copia intermedia.
+    """
+    from openpyxl import Workbook
+
+    geometria = _nombre_geometria(df)
+    atributos = [col for col in columnas if col != geometria]
+    libro = Workbook(write_only=True)
+    pagina = libro.create_sheet(hoja)
+    pagina.append(atributos)
+    for trozo in trozos(df):
+        for fila in trozo[atributos].itertuples(index=False, name=None):
+            pagina.append([None if isinstance(v, float) and np.isnan(v) else v for v in fila])
+    libro.save(_Sumidero(destino))
+
+
+GENERADORES = {
+    "CSV": generar_csv,
+    "GeoParquet": generar_geoparquet,
+}
+
+ESCRITORES = {
+    "XLSX": escribir_xlsx,
+}
+
+
+def exportar(df, columnas, formato):
+    """Escribe el formato elegido en un archivo temporal y lo devuelve posicionado al inicio."""
+    archivo = tempfile.SpooledTemporaryFile(max_size=MAX_EN_MEMORIA)
+    if formato in ESCRITORES:
+        ESCRITORES[formato](df, columnas, archivo)
+    else:
+        for datos in GENERADORES[formato](df, columnas):
+            archivo.write(datos)
+    archivo.seek(0)
+    return archivo
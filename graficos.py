@@ -0,0 +1,108 @@
+"""Gráficos de radar de La Brújula con caché compartida entre sesiones.
+
+Una misma selección (escala, localidad, indicador) produce siempre los mismos
+puntajes, y por lo tanto la misma figura. Las figuras se guardan, ya armadas y
+validadas por Plotly, en una caché LRU acotada cuya clave son las categorías,
+los valores y el rango del gráfico: las vistas repetidas solo pagan la
+serialización que hace st.plotly_chart.
+"""
+import math
+import threading
+from collections import OrderedDict
+
+from streamlit.logger import get_logger
+
+logger = get_logger(__name__)
+
+MAX_FIGURAS = 512
+INFORMAR_CADA = 200
+
+
+def figura_radar(categorias, valores, nombre, rango):
+    """Figura de radar de Plotly (el polígono se cierra repitiendo el primer punto)."""
+    import plotly.graph_objects as go
+
+    categorias = list(categorias) + [categorias[0]]
+    valores = list(valores) + [valores[0]]
+    fig = go.Figure(
+        data=go.Scatterpolar(
+            r=valores,
+            theta=categorias,
+            fill='toself',
+            name=nombre,
+            line=dict(color='#FF4B4B')
+        )
+    )
+    fig.update_layout(
+        width=300,
+        height=300,
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        polar=dict(
+            bgcolor='rgba(0,0,0,0)',
+            radialaxis=dict(
+                visible=True,
+                range=list(rango),
+                tickvals=[0, 4, 8, 12, 16, 20] if rango[1] == 20 else [0, 1, 2, 3, 4],
+                tickfont=dict(size=10)
+            ),
+            angularaxis=dict(
+                tickfont=dict(size=11)
+            )
+        ),
+        showlegend=False,
+        margin=dict(l=20, r=20, t=40, b=20)
+    )
+    return fig
+
+
+def _clave(valores):
+    """NaN no es igual a sí mismo: se lo reemplaza por None para que la clave se repita."""
+    return tuple(None if isinstance(v, float) and math.isnan(v) else v for v in valores)
+
+
+class CacheGraficos:
+    """Caché LRU de figuras de radar con contadores de aciertos."""
+
+    def __init__(self, max_figuras=MAX_FIGURAS):
+        self.max_figuras = max_figuras
+        self.aciertos = 0
+        self.fallos = 0
+        self._figuras = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def tasa_aciertos(self):
+        consultas = self.aciertos + self.fallos
+        return self.aciertos / consultas if consultas else 0.0
+
+    def radar(self, categorias, valores, nombre, rango):
+        """Devuelve la figura de la caché, armándola si no está.
+
+        La figura es compartida: no modificarla, solo pasarla a st.plotly_chart.
+        """
+        clave = (_clave(categorias), _clave(valores), nombre, tuple(rango))
+        with self._lock:
+            fig = self._figuras.get(clave)
+            if fig is not None:
+                self._figuras.move_to_end(clave)
+                self._contar(acierto=True)
+                return fig
+        fig = figura_radar(categorias, valores, nombre, rango)
+        with self._lock:
+            self._figuras[clave] = fig
+            if len(self._figuras) > self.max_figuras:
+                self._figuras.popitem(last=False)
+            self._contar(acierto=False)
+        return fig
+
+    def _contar(self, acierto):
+        if acierto:
+            self.aciertos += 1
+        else:
+            self.fallos += 1
+        if (self.aciertos + self.fallos) % INFORMAR_CADA == 0:
+            logger.info(
+                "Caché de gráficos: %.0f%% de aciertos (%d/%d), %d figuras",
+                self.tasa_aciertos * 100, self.aciertos, self.aciertos + self.fallos, len(self._figuras)
+            )
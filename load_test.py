@@ -0,0 +1,314 @@
+"""Prueba de carga de la Plataforma La Brújula.
+
+Levanta la app con `streamlit run` y simula N sesiones concurrentes que hablan el
+mismo protocolo websocket que el navegador: inician sesión con el formulario de
+acceso y luego cambian al azar escalas, localidades, indicadores, variables y
+mapas base en todas las pestañas (las pestañas en sí no generan reruns, porque
+Streamlit ejecuta el contenido de todas en cada pasada).
+
+Informa la latencia de rerun (p50/p95/p99) y, leyendo /proc (solo Linux), la
+memoria RSS y el tiempo de CPU del servidor por sesión.
+
+Uso:
+    python load_test.py --usuario fmurillo --sesiones 20 --acciones 30
+    (la contraseña se pide por teclado o se toma de BRUJULA_CLAVE)
+"""
+import argparse
+import asyncio
+import getpass
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+from urllib.request import urlopen
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from tornado.websocket import websocket_connect
+
+RUTA_APP = Path(__file__).parent / "app.py"
+FIN_OK = (ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY)
+TIMEOUT_RERUN = 120
+# Solo se tocan los selectores de navegación; el territorio y el formato de
+# exportación quedan fuera (el segundo es un rerun trivial que bajaría la latencia).
+ETIQUETAS_NAVEGACION = (
+    "Seleccionar una escala",
+    "Seleccionar una localidad",
+    "Seleccionar tipo de indicador",
+    "Seleccionar una variable",
+    "Seleccionar mapa base",
+)
+
+
+# --- Métricas del proceso servidor ---
+
+def rss_mb(pid):
+    """Memoria residente del proceso en MB, o None si no hay /proc."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for linea in f:
+                if linea.startswith("VmRSS:"):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        return None
+
+def cpu_segundos(pid):
+    """Tiempo de CPU (usuario + sistema) consumido por el proceso."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            campos = f.read().rsplit(")", 1)[1].split()
+        return (int(campos[11]) + int(campos[12])) / os.sysconf("SC_CLK_TCK")
+    except OSError:
+        return None
+
+def percentil(valores, p):
+    """Percentil por rango más cercano."""
+    if not valores:
+        return float("nan")
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, math.ceil(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+# --- Sesión simulada ---
+
+class ErrorEnScript(Exception):
+    """La app mostró una excepción: el rerun terminó, pero no es una latencia válida."""
+
+
+class Sesion:
+    """Cliente websocket que reproduce lo que el navegador envía en cada rerun."""
+
+    def __init__(self, url, timeout=TIMEOUT_RERUN):
+        self.url = url
+        self.timeout = timeout
+        self.conexion = None
+        self.widgets = {}      # id -> elemento proto visto en el último rerun
+        self.fragmentos = {}   # id de widget -> id del fragmento que lo contiene
+        self.valores = {}      # id -> WidgetState enviado por última vez
+        self.excepciones = []  # excepciones mostradas en el rerun en curso
+
+    async def conectar(self):
+        self.conexion = await websocket_connect(self.url, max_message_size=256 * 1024 * 1024)
+
+    async def rerun(self, disparador=None, fragment_id=""):
+        """Pide un rerun con los valores actuales y espera a que termine el script."""
+        msg = BackMsg()
+        msg.rerun_script.SetInParent()
+        msg.rerun_script.fragment_id = fragment_id
+        estados = list(self.valores.values()) + ([disparador] if disparador else [])
+        msg.rerun_script.widget_states.widgets.extend(estados)
+        if not fragment_id:
+            self.widgets = {}
+        self.excepciones = []
+        inicio = time.perf_counter()
+        await self.conexion.write_message(msg.SerializeToString(), binary=True)
+        while True:
+            try:
+                datos = await asyncio.wait_for(self.conexion.read_message(), self.timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"Sin respuesta del servidor en {self.timeout:.0f} s") from None
+            if datos is None:
+                raise ConnectionError("El servidor cerró la conexión")
+            fwd = ForwardMsg()
+            fwd.ParseFromString(datos)
+            tipo = fwd.WhichOneof("type")
+            if tipo == "delta" and fwd.delta.WhichOneof("type") == "new_element":
+                self._registrar_widget(fwd.delta)
+            elif tipo == "script_finished":
+                if fwd.script_finished in FIN_OK:
+                    # Una excepción en el script también termina "con éxito": se muestra como elemento
+                    if self.excepciones:
+                        raise ErrorEnScript("; ".join(self.excepciones))
+                    return time.perf_counter() - inicio
+                if fwd.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    raise RuntimeError("La app no compila")
+
+    def _registrar_widget(self, delta):
+        elemento = delta.new_element
+        tipo = elemento.WhichOneof("type")
+        if tipo == "exception":
+            self.excepciones.append(f"{elemento.exception.type}: {elemento.exception.message}")
+        if tipo in ("selectbox", "text_input", "button"):
+            widget = getattr(elemento, tipo)
+            self.widgets[widget.id] = (tipo, widget)
+            self.fragmentos[widget.id] = delta.fragment_id
+
+    def _buscar(self, tipo, etiqueta=None, **atributos):
+        for _, (t, widget) in self.widgets.items():
+            if t != tipo or (etiqueta and widget.label != etiqueta):
+                continue
+            if all(getattr(widget, k) == v for k, v in atributos.items()):
+                return widget
+        return None
+
+    async def iniciar_sesion(self, usuario, clave):
+        await self.rerun()
+        campo_usuario = self._buscar("text_input", "Username")
+        campo_clave = self._buscar("text_input", "Password")
+        boton = self._buscar("button", is_form_submitter=True)
+        if not (campo_usuario and campo_clave and boton):
+            raise RuntimeError("No se encontró el formulario de acceso")
+        self.valores[campo_usuario.id] = WidgetState(id=campo_usuario.id, string_value=usuario)
+        self.valores[campo_clave.id] = WidgetState(id=campo_clave.id, string_value=clave)
+        latencia = await self.rerun(WidgetState(id=boton.id, trigger_value=True))
+        if not self._buscar("selectbox"):
+            raise RuntimeError("Usuario o contraseña rechazados")
+        return latencia
+
+    async def accion_al_azar(self):
+        """Cambia un selector de navegación visible a otra opción y devuelve la latencia del rerun."""
+        selectboxes = [
+            w for t, w in self.widgets.values()
+            if t == "selectbox" and len(w.options) > 1 and w.label.startswith(ETIQUETAS_NAVEGACION)
+        ]
+        if not selectboxes:
+            return await self.rerun()
+        widget = random.choice(selectboxes)
+        estado = self.valores.get(widget.id)
+        actual = estado.string_value if estado else widget.options[widget.default]
+        opcion = random.choice([o for o in widget.options if o != actual])
+        self.valores[widget.id] = WidgetState(id=widget.id, string_value=opcion)
+        return await self.rerun(fragment_id=self.fragmentos.get(widget.id, ""))
+
+
+async def simular_sesion(url, usuario, clave, acciones, pausa, resultados, timeout=TIMEOUT_RERUN):
+    sesion = Sesion(url, timeout)
+    try:
+        await sesion.conectar()
+        resultados["login"].append(await sesion.iniciar_sesion(usuario, clave))
+        for _ in range(acciones):
+            await asyncio.sleep(random.uniform(0, pausa * 2))
+            try:
+                resultados["rerun"].append(await sesion.accion_al_azar())
+            except ErrorEnScript as e:
+                # La sesión sigue; el rerun fallido no entra en los percentiles
+                resultados["errores"].append(f"ErrorEnScript: {e}")
+    except Exception as e:
+        resultados["errores"].append(f"{type(e).__name__}: {e}")
+    finally:
+        if sesion.conexion is not None:
+            sesion.conexion.close()
+
+
+async def muestrear_rss(pid, muestras, detener):
+    while not detener.is_set():
+        valor = rss_mb(pid)
+        if valor is not None:
+            muestras.append(valor)
+        await asyncio.sleep(0.25)
+
+
+async def ejecutar(args, pid):
+    url = f"ws://localhost:{args.puerto}/_stcore/stream"
+    resultados = {"login": [], "rerun": [], "errores": []}
+
+    # Una sesión de calentamiento carga los datos antes de tomar la línea de base
+    await simular_sesion(url, args.usuario, args.clave, 1, 0, {"login": [], "rerun": [], "errores": resultados["errores"]}, args.timeout)
+    if resultados["errores"]:
+        return resultados, {}
+
+    rss_base, cpu_base = rss_mb(pid), cpu_segundos(pid)
+    muestras, detener = [], asyncio.Event()
+    muestreo = asyncio.create_task(muestrear_rss(pid, muestras, detener))
+    inicio = time.perf_counter()
+    await asyncio.gather(*(
+        simular_sesion(url, args.usuario, args.clave, args.acciones, args.pausa, resultados, args.timeout)
+        for _ in range(args.sesiones)
+    ))
+    duracion = time.perf_counter() - inicio
+    detener.set()
+    await muestreo
+    servidor = {
+        "duracion": duracion,
+        "rss_base": rss_base,
+        "rss_pico": max(muestras) if muestras else None,
+        "cpu": (cpu_segundos(pid) - cpu_base) if cpu_base is not None else None,
+    }
+    return resultados, servidor
+
+
+def esperar_servidor(puerto, proceso, timeout=120):
+    limite = time.time() + timeout
+    while time.time() < limite:
+        if proceso.poll() is not None:
+            sys.exit("La app terminó antes de quedar disponible")
+        try:
+            with urlopen(f"http://localhost:{puerto}/_stcore/health", timeout=2) as r:
+                if r.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.5)
+    sys.exit("La app no respondió a tiempo")
+
+
+def informar(args, resultados, servidor):
+    print(f"\nSesiones: {args.sesiones} | acciones por sesión: {args.acciones}")
+    if resultados["errores"]:
+        print(f"Errores ({len(resultados['errores'])}):")
+        for error in sorted(set(resultados["errores"])):
+            print(f"  - {error}")
+    for nombre in ("login", "rerun"):
+        valores = resultados[nombre]
+        if valores:
+            print(
+                f"Latencia {nombre:5} (n={len(valores)}): "
+                f"p50={percentil(valores, 50) * 1000:.0f} ms  "
+                f"p95={percentil(valores, 95) * 1000:.0f} ms  "
+                f"p99={percentil(valores, 99) * 1000:.0f} ms"
+            )
+    if not servidor:
+        return
+    print(f"Reruns por segundo: {len(resultados['rerun']) / servidor['duracion']:.1f}")
+    if servidor["rss_base"] is not None and servidor["rss_pico"] is not None:
+        por_sesion = (servidor["rss_pico"] - servidor["rss_base"]) / args.sesiones
+        print(f"RSS servidor: base={servidor['rss_base']:.0f} MB  pico={servidor['rss_pico']:.0f} MB  por sesión={por_sesion:.1f} MB")
+    if servidor["cpu"] is not None:
+        print(
+            f"CPU servidor: {servidor['cpu']:.1f} s en total, {servidor['cpu'] / args.sesiones:.2f} s por sesión "
+            f"({servidor['cpu'] / servidor['duracion'] * 100:.0f}% de un núcleo)"
+        )
+    else:
+        print("RSS/CPU del servidor no disponibles (se leen de /proc, solo Linux).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sesiones", type=int, default=10, help="sesiones concurrentes")
+    parser.add_argument("--acciones", type=int, default=20, help="cambios de selección por sesión")
+    parser.add_argument("--pausa", type=float, default=0.5, help="pausa media entre acciones (s)")
+    parser.add_argument("--usuario", required=True)
+    parser.add_argument("--clave", default=os.environ.get("BRUJULA_CLAVE"))
+    parser.add_argument("--puerto", type=int, default=8599)
+    parser.add_argument("--semilla", type=int, default=None)
+    parser.add_argument("--timeout", type=float, default=TIMEOUT_RERUN, help="espera máxima por mensaje del servidor (s)")
+    args = parser.parse_args()
+    if args.clave is None:
+        args.clave = getpass.getpass("Contraseña: ")
+    random.seed(args.semilla)
+
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", str(RUTA_APP),
+         "--server.headless", "true", "--server.port", str(args.puerto),
+         "--browser.gatherUsageStats", "false", "--server.fileWatcherType", "none"],
+        cwd=RUTA_APP.parent,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        esperar_servidor(args.puerto, proceso)
+        resultados, servidor = asyncio.run(ejecutar(args, proceso.pid))
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=30)
+    informar(args, resultados, servidor)
+    if resultados["errores"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Rasterización de coropléticos para selecciones con muchos polígonos.
+
+Cuando la cantidad de unidades es grande, embeber el GeoJSON completo en el mapa
+satura al navegador. En su lugar se pinta la variable en una imagen PNG del lado
+del servidor (en Web Mercator, la misma proyección del mapa) que se muestra como
+ImageOverlay, de modo que el costo en el navegador depende de los píxeles y no
+de la cantidad de polígonos.
+"""
+import base64
+import io
+
+import numpy as np
+import shapely
+from PIL import Image, ImageColor, ImageDraw
+
+ANCHO_MAX_PX = 4096
+OPACIDAD_RELLENO = 128
+COLOR_BORDE = "#A40000"
+
+
+def _a_pixeles(anillo, minx, maxy, escala):
+    coords = shapely.get_coordinates(anillo)
+    return list(map(tuple, np.column_stack(((coords[:, 0] - minx) * escala, (maxy - coords[:, 1]) * escala))))
+
+
+def _rellenar_con_huecos(imagen, exterior, huecos, relleno):
+    """Pinta el exterior menos los huecos a través de una máscara propia del polígono.
+
+    Pintar los huecos como transparentes sobre la imagen borraría las unidades
+    ya dibujadas que caen dentro de ellos.
+    """
+    xs, ys = zip(*exterior)
+    x0, y0 = max(0, int(np.floor(min(xs)))), max(0, int(np.floor(min(ys))))
+    x1, y1 = min(imagen.width, int(np.ceil(max(xs))) + 1), min(imagen.height, int(np.ceil(max(ys))) + 1)
+    if x1 <= x0 or y1 <= y0:
+        return
+    mascara = Image.new("L", (x1 - x0, y1 - y0), 0)
+    dibujo = ImageDraw.Draw(mascara)
+    dibujo.polygon([(x - x0, y - y0) for x, y in exterior], fill=255)
+    for hueco in huecos:
+        dibujo.polygon([(x - x0, y - y0) for x, y in hueco], fill=0)
+    imagen.paste(relleno, (x0, y0, x1, y1), mascara)
+
+
+def rasterizar(geometrias, colores, ancho_max=ANCHO_MAX_PX):
+    """Pinta cada geometría (GeoSeries en EPSG:4326) con su color hexadecimal.
+
+    Devuelve la imagen como data URL PNG y sus límites [[sur, oeste], [norte, este]].
+    """
+    mercator = geometrias.to_crs(3857)
+    oeste, sur, este, norte = geometrias.total_bounds
+    minx, miny, maxx, maxy = mercator.total_bounds
+    escala = ancho_max / max(maxx - minx, maxy - miny)
+    ancho = max(1, int(np.ceil((maxx - minx) * escala)))
+    alto = max(1, int(np.ceil((maxy - miny) * escala)))
+
+    imagen = Image.new("RGBA", (ancho, alto), (0, 0, 0, 0))
+    dibujo = ImageDraw.Draw(imagen)
+    borde = ImageColor.getrgb(COLOR_BORDE) + (255,)
+    for geometria, color in zip(mercator.values, colores):
+        if geometria is None or geometria.is_empty:
+            continue
+        relleno = ImageColor.getrgb(color)[:3] + (OPACIDAD_RELLENO,)
+        for poligono in getattr(geometria, "geoms", [geometria]):
+            if poligono.geom_type != "Polygon":
+                continue
+            exterior = _a_pixeles(poligono.exterior, minx, maxy, escala)
+            huecos = [_a_pixeles(hueco, minx, maxy, escala) for hueco in poligono.interiors]
+            if huecos:
+                _rellenar_con_huecos(imagen, exterior, huecos, relleno)
+                dibujo.polygon(exterior, outline=borde)
+                for hueco in huecos:
+                    dibujo.polygon(hueco, outline=borde)
+            else:
+                dibujo.polygon(exterior, fill=relleno, outline=borde)
+
+    buffer = io.BytesIO()
+    imagen.save(buffer, format="PNG", optimize=True)
+    data_url = "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+    return data_url, [[float(sur), float(oeste)], [float(norte), float(este)]]
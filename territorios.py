@@ -0,0 +1,277 @@
+"""Registro de territorios de la Plataforma La Brújula.
+
+Cada territorio se declara en territorios.toml con sus archivos de datos, su
+esquema de códigos (COD) por escala y sus textos institucionales. Los datos se
+cargan recién en la primera consulta y se descartan en orden LRU cuando la
+memoria ocupada supera el presupuesto global.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import toml
+from streamlit.logger import get_logger
+
+logger = get_logger(__name__)
+
+MB = 1024 * 1024
+MAX_RASTERS_MB = 64
+# Medido con shapely 2 / GEOS: cada geometría ocupa ~600 bytes fijos (objeto
+# Python y estructuras de GEOS) y cada coordenada ~32 bytes, no los 16 de x, y.
+BYTES_POR_GEOMETRIA = 600
+BYTES_POR_COORDENADA = 32
+RUTA_CONFIG = Path(__file__).parent / "territorios.toml"
+
+
+@dataclass
+class Territorio:
+    """Configuración de un territorio, tal como figura en territorios.toml."""
+    clave: str
+    nombre: str
+    titulo: str
+    proyecto: str
+    convenio: str
+    portada: str
+    consolidado: Path
+    metricas: Path
+    conclusiones: Path
+    escalas: dict
+    escala_localidades: str
+    escala_manzanas: str
+    centro: tuple
+    memoria_mb: float = 0
+
+    @property
+    def escalas_detalladas(self):
+        """Escalas sin métricas ni conclusiones propias (localidades y manzanas)."""
+        return (self.escala_localidades, self.escala_manzanas)
+
+
+class CacheLRU:
+    """Caché LRU acotada en bytes; informa cada cambio de tamaño con `al_cambiar(delta)`."""
+
+    def __init__(self, max_bytes, al_cambiar=None):
+        self.max_bytes = int(max_bytes)
+        self.al_cambiar = al_cambiar
+        self.bytes = 0
+        self._valores = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave, crear, medir):
+        """Devuelve el valor guardado o lo crea con `crear()` y lo mide con `medir(valor)`."""
+        with self._lock:
+            guardado = self._valores.get(clave)
+            if guardado is not None:
+                self._valores.move_to_end(clave)
+                return guardado[0]
+        valor = crear()
+        tamano = int(medir(valor))
+        delta = 0
+        with self._lock:
+            if clave not in self._valores:
+                self._valores[clave] = (valor, tamano)
+                delta += tamano
+                while self.bytes + delta > self.max_bytes and len(self._valores) > 1:
+                    _, (_, tamano_viejo) = self._valores.popitem(last=False)
+                    delta -= tamano_viejo
+                self.bytes += delta
+            valor = self._valores[clave][0]
+        if delta and self.al_cambiar is not None:
+            self.al_cambiar(delta)
+        return valor
+
+
+@dataclass
+class DatosTerritorio:
+    """Datos cargados de un territorio y su tamaño estimado en memoria."""
+    territorio: Territorio
+    gdf: object
+    metricas: object
+    conclusiones: object
+    localidades: list
+    tamano_bytes: int
+    _indice_areas: object = field(default=None, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    al_crecer: object = field(default=None, repr=False)
+    rasters: CacheLRU = field(default=None, repr=False)
+    _selecciones: dict = field(default_factory=dict, repr=False)
+
+    def __post_init__(self):
+        # Coropléticos rasterizados (ver raster.py); se descartan junto con el territorio
+        self.rasters = CacheLRU(MAX_RASTERS_MB * MB, al_cambiar=self.sumar_bytes)
+
+    def sumar_bytes(self, cantidad):
+        """Suma (o resta) memoria ocupada después de la carga y avisa al registro para que revise el presupuesto."""
+        with self._lock:
+            self.tamano_bytes += int(cantidad)
+        if self.al_crecer is not None:
+            self.al_crecer()
+
+    def unidades(self, cod_prefijo, localidad=None):
+        """Unidades de una escala (y, si se indica, de una localidad), guardadas por selección.
+
+        El resultado es compartido entre sesiones: copiarlo antes de modificarlo.
+        """
+        clave = (cod_prefijo, localidad)
+        with self._lock:
+            gdf = self._selecciones.get(clave)
+        if gdf is not None:
+            return gdf
+        gdf = self.gdf[self.gdf['COD'].str.startswith(cod_prefijo)]
+        if localidad is not None:
+            gdf = gdf[gdf['LOCALIDAD'] == localidad]
+        with self._lock:
+            if clave in self._selecciones:
+                return self._selecciones[clave]
+            self._selecciones[clave] = gdf
+        # Las geometrías y los textos se comparten con self.gdf: la copia solo ocupa sus punteros
+        self.sumar_bytes(gdf.memory_usage(index=True, deep=False).sum())
+        return gdf
+
+    def indice_areas(self, columnas):
+        """Índice espacial de manzanas para agregar áreas arbitrarias; se construye una vez."""
+        indice = None
+        with self._lock:
+            if self._indice_areas is None:
+                from areas import IndiceAreas
+
+                prefijo_man = self.territorio.escalas[self.territorio.escala_manzanas]
+                manzanas = self.gdf[self.gdf['COD'].str.startswith(prefijo_man)]
+                self._indice_areas = IndiceAreas(manzanas, columnas)
+                indice = self._indice_areas
+        if indice is not None:
+            self.sumar_bytes(indice.tamano_bytes)
+        return self._indice_areas
+
+
+def leer_configuracion(ruta=RUTA_CONFIG):
+    """Lee territorios.toml y devuelve (territorios, presupuesto en MB)."""
+    ruta = Path(ruta)
+    config = toml.load(ruta)
+    territorios = {}
+    for clave, datos in config.get("territorios", {}).items():
+        territorios[clave] = Territorio(
+            clave=clave,
+            nombre=datos["nombre"],
+            titulo=datos["titulo"],
+            proyecto=datos.get("proyecto", ""),
+            convenio=datos.get("convenio", ""),
+            portada=str(ruta.parent / datos["portada"]) if "portada" in datos else "",
+            consolidado=ruta.parent / datos["consolidado"],
+            metricas=ruta.parent / datos["metricas"],
+            conclusiones=ruta.parent / datos["conclusiones"],
+            escalas=dict(datos["escalas"]),
+            escala_localidades=datos["escala_localidades"],
+            escala_manzanas=datos["escala_manzanas"],
+            centro=tuple(datos["centro"]),
+            memoria_mb=datos.get("memoria_mb", 0),
+        )
+    if not territorios:
+        raise ValueError(f"No hay territorios definidos en {ruta}")
+    return territorios, config.get("memoria_mb", 2048)
+
+
+def tamano_geometrias(geometrias):
+    """Estimación en bytes de un arreglo de geometrías de shapely."""
+    import numpy as np
+    import shapely
+
+    geometrias = np.asarray(geometrias)
+    coordenadas = shapely.get_num_coordinates(geometrias).sum()
+    return int(len(geometrias) * BYTES_POR_GEOMETRIA + coordenadas * BYTES_POR_COORDENADA)
+
+
+def tamano_en_memoria(gdf, *dfs):
+    """Estimación en bytes de un GeoDataFrame (incluidas sus geometrías) y tablas extra."""
+    atributos = gdf.drop(columns=gdf.geometry.name).memory_usage(deep=True).sum()
+    extras = sum(df.memory_usage(deep=True).sum() for df in dfs)
+    return int(atributos + tamano_geometrias(gdf.geometry.values) + extras)
+
+
+def cargar_territorio(territorio):
+    """Lee los archivos de un territorio."""
+    import geopandas as gpd
+    import pandas as pd
+
+    gdf = gpd.read_file(territorio.consolidado)
+    metricas = pd.read_excel(territorio.metricas)
+    conclusiones = pd.read_excel(territorio.conclusiones)
+    prefijo_loc = territorio.escalas[territorio.escala_localidades]
+    localidades = sorted(gdf[gdf['COD'].str.startswith(prefijo_loc)]['LOCALIDAD'].dropna().unique().tolist())
+    return DatosTerritorio(
+        territorio=territorio,
+        gdf=gdf,
+        metricas=metricas,
+        conclusiones=conclusiones,
+        localidades=localidades,
+        # La reserva de territorios.toml es un piso: la estimación no ve la fragmentación del heap
+        tamano_bytes=max(tamano_en_memoria(gdf, metricas, conclusiones), int(territorio.memoria_mb * MB)),
+    )
+
+
+class RegistroTerritorios:
+    """Carga perezosa de territorios con desalojo LRU bajo un presupuesto de memoria."""
+
+    def __init__(self, territorios, memoria_mb):
+        self.territorios = territorios
+        self.presupuesto_bytes = int(memoria_mb * MB)
+        self._cargados = OrderedDict()
+        self._lock = threading.Lock()
+        self._locks_carga = {clave: threading.Lock() for clave in territorios}
+
+    @property
+    def por_defecto(self):
+        return next(iter(self.territorios))
+
+    def memoria_usada(self):
+        """Suma de los tamaños cargados; llamar con self._lock tomado."""
+        return sum(datos.tamano_bytes for datos in self._cargados.values())
+
+    def obtener(self, clave):
+        """Devuelve los datos del territorio, cargándolos si no están en memoria."""
+        datos = self._buscar(clave)
+        if datos is not None:
+            return datos
+        # Un lock por territorio evita que dos sesiones lean los mismos archivos a la vez
+        with self._locks_carga[clave]:
+            datos = self._buscar(clave)
+            if datos is not None:
+                return datos
+            territorio = self.territorios[clave]
+            with self._lock:
+                self._liberar(territorio.memoria_mb * MB, excepto=clave)
+            datos = cargar_territorio(territorio)
+            datos.al_crecer = lambda: self._reajustar(clave)
+            with self._lock:
+                self._cargados[clave] = datos
+                self._liberar(0, excepto=clave)
+                en_uso = self.memoria_usada()
+            logger.info(
+                "Territorio %s cargado (%.1f MB, %.1f/%.1f MB en uso)",
+                clave, datos.tamano_bytes / MB, en_uso / MB, self.presupuesto_bytes / MB
+            )
+            return datos
+
+    def _reajustar(self, clave):
+        """Vuelve a aplicar el presupuesto cuando un territorio cargado creció."""
+        with self._lock:
+            if clave in self._cargados:
+                self._liberar(0, excepto=clave)
+
+    def _buscar(self, clave):
+        with self._lock:
+            datos = self._cargados.get(clave)
+            if datos is not None:
+                self._cargados.move_to_end(clave)
+            return datos
+
+    def _liberar(self, reserva_bytes, excepto):
+        """Desaloja territorios, del menos usado recientemente, hasta que entre la reserva."""
+        for clave in list(self._cargados):
+            if self.memoria_usada() + reserva_bytes <= self.presupuesto_bytes:
+                break
+            if clave == excepto:
+                continue
+            del self._cargados[clave]
+            logger.info("Territorio %s desalojado de memoria", clave)